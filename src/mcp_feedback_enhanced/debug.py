@@ -22,9 +22,16 @@ debug_log("這是一條調試信息")
 
 import os
 import sys
+from functools import lru_cache
 from typing import Any
 
 
+@lru_cache(maxsize=8)
+def _parse_debug_flag(value: str) -> bool:
+    """解析 MCP_DEBUG 環境變數值（按原始值快取）"""
+    return value.lower() in ("true", "1", "yes", "on")
+
+
 def debug_log(message: Any, prefix: str = "DEBUG") -> None:
     """
     輸出調試訊息到標準錯誤，避免污染標準輸出
@@ -34,7 +41,7 @@ def debug_log(message: Any, prefix: str = "DEBUG") -> None:
         prefix: 調試信息的前綴標識，默認為 "DEBUG"
     """
     # 只在啟用調試模式時才輸出，避免干擾 MCP 通信
-    if os.getenv("MCP_DEBUG", "").lower() not in ("true", "1", "yes", "on"):
+    if not is_debug_enabled():
         return
 
     try:
@@ -70,8 +77,12 @@ def web_debug_log(message: Any) -> None:
 
 
 def is_debug_enabled() -> bool:
-    """檢查是否啟用了調試模式"""
-    return os.getenv("MCP_DEBUG", "").lower() in ("true", "1", "yes", "on")
+    """
+    檢查是否啟用了調試模式
+
+    熱路徑上可先以此判斷，避免在調試關閉時仍格式化日誌字串。
+    """
+    return _parse_debug_flag(os.environ.get("MCP_DEBUG", ""))
 
 
 def set_debug_mode(enabled: bool) -> None:
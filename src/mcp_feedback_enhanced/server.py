@@ -99,7 +99,7 @@ def init_encoding():
                 sys.stdin.reconfigure(encoding="utf-8", errors="replace")
             if hasattr(sys.stderr, "reconfigure"):
                 sys.stderr.reconfigure(encoding="utf-8", errors="replace")
-        except:
+        except (OSError, ValueError):
             pass
         return False
 
@@ -14,6 +14,8 @@
     code = get_message_code("SESSION_FEEDBACK_SUBMITTED")
 """
 
+from functools import cache
+
 
 class MessageCodes:
     """訊息代碼常量類"""
@@ -137,9 +139,10 @@ LEGACY_KEY_MAPPING = {
 }
 
 
+@cache
 def get_message_code(key: str) -> str:
     """
-    獲取訊息代碼
+    獲取訊息代碼（解析結果固定，首次解析後快取）
 
     支援三種輸入方式：
     1. 直接使用常量名稱：get_message_code("SESSION_FEEDBACK_SUBMITTED")
@@ -153,21 +156,24 @@ def get_message_code(key: str) -> str:
         訊息代碼字串（例如："session.feedbackSubmitted"）
     """
     # 嘗試直接從 MessageCodes 獲取
-    if hasattr(MessageCodes, key):
-        return str(getattr(MessageCodes, key))
+    code = getattr(MessageCodes, key, None)
+    if code is not None:
+        return str(code)
 
     # 嘗試從映射表獲取（支援大寫和小寫）
     upper_key = key.upper()
     if upper_key in LEGACY_KEY_MAPPING:
         constant_name = LEGACY_KEY_MAPPING[upper_key]
-        if hasattr(MessageCodes, constant_name):
-            return str(getattr(MessageCodes, constant_name))
+        code = getattr(MessageCodes, constant_name, None)
+        if code is not None:
+            return str(code)
 
     # 如果是小寫的 key，也嘗試映射
     if key in LEGACY_KEY_MAPPING:
         constant_name = LEGACY_KEY_MAPPING[key]
-        if hasattr(MessageCodes, constant_name):
-            return str(getattr(MessageCodes, constant_name))
+        code = getattr(MessageCodes, constant_name, None)
+        if code is not None:
+            return str(code)
 
     # 如果都找不到，返回一個預設格式
     return f"unknown.{key}"
@@ -9,6 +9,8 @@ Web UI 主要管理類
 import asyncio
 import concurrent.futures
 import os
+import socket
+import sys
 import threading
 import time
 import uuid
@@ -16,20 +18,130 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+import jinja2
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.websockets import WebSocketState
 
+from ..debug import is_debug_enabled
 from ..debug import web_debug_log as debug_log
 from ..utils.error_handler import ErrorHandler, ErrorType
 from ..utils.memory_monitor import get_memory_monitor
+from .constants import get_message_code
 from .models import CleanupReason, SessionStatus, WebFeedbackSession
 from .routes import setup_routes
 from .utils import get_browser_opener
 from .utils.compression_config import get_compression_manager
 from .utils.port_manager import PortManager
+from .utils.ws_messages import encode_message, send_message
+
+
+# uvloop 為可選依賴（Windows 不支援），可用時作為伺服器事件循環
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# websockets 的 C 擴展負責幀掩碼（apply_mask）運算，缺失時退回逐字節的純 Python 實作，
+# 大圖片經 WebSocket 提交時會明顯佔用 CPU
+try:
+    import websockets.speedups  # noqa: F401
+
+    WEBSOCKETS_SPEEDUPS_AVAILABLE = True
+except ImportError:
+    WEBSOCKETS_SPEEDUPS_AVAILABLE = False
+
+# 壓縮統計彙總間隔（秒）
+STATS_FLUSH_INTERVAL = 10
+
+# 標籤頁過期閾值（秒）
+TAB_EXPIRED_SEC = 60
+
+# 等待伺服器就緒的最長時間（秒）
+SERVER_READY_TIMEOUT = 5
+
+# WebSocket 協議層 ping 間隔與超時（秒）
+# 前端已有應用層心跳（60 秒）負責存活檢測，協議層 ping 只需作為兜底
+WS_PING_INTERVAL = 300
+WS_PING_TIMEOUT = 60
+
+# 內存壓力清理：優先清理的會話狀態與空閒閾值（秒）
+# 不含 EXPIRED：過期會話由 cleanup_expired_sessions 清理，與原有行為一致
+MEMORY_PRESSURE_CLEANUP_STATUSES = frozenset(
+    {SessionStatus.COMPLETED, SessionStatus.ERROR, SessionStatus.TIMEOUT}
+)
+IDLE_SUBMITTED_SEC = 300  # 已提交反饋的會話空閒 5 分鐘
+IDLE_GENERAL_SEC = 600  # 其他會話空閒 10 分鐘
+
+# 啟動時預先編譯的頁面模板
+TEMPLATE_PREWARM_NAMES = ("index.html", "feedback.html")
+
+
+class _ReadySignalServer(uvicorn.Server):
+    """在監聽 socket 綁定完成後發出就緒信號的 uvicorn 伺服器"""
+
+    def __init__(self, config: uvicorn.Config, ready_event: threading.Event):
+        super().__init__(config)
+        self._ready_event = ready_event
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if self.started:
+            self._ready_event.set()
+
+
+class _ResponseStatsMiddleware:
+    """ASGI 中間件：在 send 通道上累計實際送出的響應字節與壓縮次數"""
+
+    def __init__(self, app, manager: "WebUIManager"):
+        self.app = app
+        self.manager = manager
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        manager = self.manager
+
+        async def send_wrapper(message):
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                manager._stats_requests += 1
+                for key, _ in message.get("headers", ()):
+                    if key.lower() == b"content-encoding":
+                        manager._stats_compressed += 1
+                        break
+            elif message_type == "http.response.body":
+                manager._stats_bytes += len(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class _OriginalSizeStatsMiddleware:
+    """ASGI 中間件（位於 GZip 之內）：累計壓縮前的響應 body 字節"""
+
+    def __init__(self, app, manager: "WebUIManager"):
+        self.app = app
+        self.manager = manager
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        manager = self.manager
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.body":
+                manager._stats_bytes_original += len(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
 
 class WebUIManager:
@@ -78,7 +190,7 @@ class WebUIManager:
             # 如果明確指定了端口，使用指定的端口
             self.port = port
             # 檢查指定端口是否可用
-            if not PortManager.is_port_available(self.host, self.port):
+            if not PortManager.is_port_available(self.host, self.port, strict=True):
                 debug_log(f"警告：指定的端口 {self.port} 可能已被佔用")
                 # 在測試模式下，嘗試尋找替代端口
                 if os.environ.get("MCP_TEST_MODE", "").lower() == "true":
@@ -91,8 +203,6 @@ class WebUIManager:
                         debug_log(f"自動切換到可用端口: {original_port} → {self.port}")
         elif preferred_port == 0:
             # 如果偏好端口為 0，使用系統自動分配
-            import socket
-
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.bind((self.host, 0))
                 self.port = s.getsockname()[1]
@@ -104,6 +214,12 @@ class WebUIManager:
             )
         self.app = FastAPI(title="MCP Feedback Enhanced")
 
+        # 響應統計計數器（由中間件累加，背景任務定期彙總）
+        self._stats_requests = 0
+        self._stats_compressed = 0
+        self._stats_bytes = 0
+        self._stats_bytes_original = 0
+
         # 設置壓縮和緩存中間件
         self._setup_compression_middleware()
 
@@ -118,7 +234,7 @@ class WebUIManager:
         self.global_active_tabs: dict[str, dict] = {}
 
         # 會話更新通知標記
-        self._pending_session_update = False
+        self._pending_session_update: bool = False
 
         # 會話清理統計
         self.cleanup_stats: dict[str, Any] = {
@@ -126,13 +242,15 @@ class WebUIManager:
             "expired_cleanups": 0,
             "memory_pressure_cleanups": 0,
             "manual_cleanups": 0,
-            "last_cleanup_time": None,
+            "last_cleanup_time_ts": None,
             "total_cleanup_duration": 0.0,
             "sessions_cleaned": 0,
         }
 
         self.server_thread: threading.Thread | None = None
         self.server_process = None
+        self._ready_event = threading.Event()
+        self._background_tasks: set[asyncio.Task] = set()
         self.desktop_app_instance: Any = None  # 桌面應用實例引用
 
         # 初始化標記，用於追蹤異步初始化狀態
@@ -200,7 +318,7 @@ class WebUIManager:
                 return False
 
         # 在線程池中執行
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
         with concurrent.futures.ThreadPoolExecutor() as executor:
             await loop.run_in_executor(executor, preload_i18n)
 
@@ -210,6 +328,9 @@ class WebUIManager:
         compression_manager = get_compression_manager()
         config = compression_manager.config
 
+        # 在 GZip 之內記錄壓縮前的響應大小，與最外層的實際送出大小對照
+        self.app.add_middleware(_OriginalSizeStatsMiddleware, manager=self)
+
         # 添加 Gzip 壓縮中間件
         self.app.add_middleware(GZipMiddleware, minimum_size=config.minimum_size)
 
@@ -219,36 +340,45 @@ class WebUIManager:
             """壓縮和緩存中間件"""
             response = await call_next(request)
 
-            # 添加緩存頭
-            if not config.should_exclude_path(request.url.path):
-                cache_headers = config.get_cache_headers(request.url.path)
-                for key, value in cache_headers.items():
+            # 添加緩存頭（路徑分類由壓縮管理器快取）
+            path = request.url.path
+            if not compression_manager.should_exclude_path(path):
+                for key, value in compression_manager.iter_cache_headers(path):
                     response.headers[key] = value
 
-            # 更新壓縮統計（如果可能）
-            try:
-                content_length = int(response.headers.get("content-length", 0))
-                content_encoding = response.headers.get("content-encoding", "")
-                was_compressed = "gzip" in content_encoding
-
-                if content_length > 0:
-                    # 估算原始大小（如果已壓縮，假設壓縮比為 30%）
-                    original_size = (
-                        content_length
-                        if not was_compressed
-                        else int(content_length / 0.7)
-                    )
-                    compression_manager.update_stats(
-                        original_size, content_length, was_compressed
-                    )
-            except (ValueError, TypeError):
-                # 忽略統計錯誤，不影響正常響應
-                pass
-
             return response
 
+        # 添加響應統計中間件（最外層），由 _stats_flusher 定期彙總到壓縮管理器
+        self.app.add_middleware(_ResponseStatsMiddleware, manager=self)
+
         debug_log("壓縮和緩存中間件設置完成")
 
+    def _flush_compression_stats(self):
+        """將累計的響應統計彙總到壓縮管理器"""
+        if self._stats_requests == 0:
+            return
+
+        get_compression_manager().update_stats_batch(
+            self._stats_requests,
+            self._stats_compressed,
+            self._stats_bytes_original,
+            self._stats_bytes,
+        )
+        self._stats_requests = 0
+        self._stats_compressed = 0
+        self._stats_bytes = 0
+        self._stats_bytes_original = 0
+
+    async def _stats_flusher(self):
+        """定期彙總響應統計的背景任務"""
+        try:
+            while True:
+                await asyncio.sleep(STATS_FLUSH_INTERVAL)
+                self._flush_compression_stats()
+        except asyncio.CancelledError:
+            self._flush_compression_stats()
+            raise
+
     def _setup_memory_monitoring(self):
         """設置內存監控"""
         try:
@@ -322,7 +452,17 @@ class WebUIManager:
         # Web UI 模板
         web_templates_path = Path(__file__).parent / "templates"
         if web_templates_path.exists():
-            self.templates = Jinja2Templates(directory=str(web_templates_path))
+            # 模板隨套件發佈，僅在調試模式下檢查檔案變更；編譯結果不限數量地快取
+            env = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(str(web_templates_path)),
+                autoescape=True,
+                auto_reload=is_debug_enabled(),
+                cache_size=-1,
+            )
+            self.templates = Jinja2Templates(env=env)
+            # 預先編譯頁面模板，首個請求無需等待編譯
+            for template_name in TEMPLATE_PREWARM_NAMES:
+                env.get_template(template_name)
         else:
             raise RuntimeError(f"Templates directory not found: {web_templates_path}")
 
@@ -331,8 +471,10 @@ class WebUIManager:
         # 保存舊會話的引用和 WebSocket 連接
         old_session = self.current_session
         old_websocket = None
+        old_websocket_loop = None
         if old_session and old_session.websocket:
             old_websocket = old_session.websocket
+            old_websocket_loop = old_session._websocket_loop
             debug_log("保存舊會話的 WebSocket 連接以發送更新通知")
 
         # 創建新會話
@@ -346,8 +488,7 @@ class WebUIManager:
             )
 
             # 保存標籤頁狀態到全局
-            if hasattr(old_session, "active_tabs"):
-                self._merge_tabs_to_global(old_session.active_tabs)
+            self._merge_tabs_to_global(old_session.active_tabs)
 
             # 如果舊會話是已提交狀態，進入下一步（已完成）
             if old_session.status == SessionStatus.FEEDBACK_SUBMITTED:
@@ -388,7 +529,8 @@ class WebUIManager:
         # 處理WebSocket連接轉移
         if old_websocket:
             # 直接轉移連接到新會話，消息發送由 smart_open_browser 統一處理
-            session.websocket = old_websocket
+            # create_session 在 MCP 調用方的事件循環執行，沿用舊連接所在的循環
+            session.attach_websocket(old_websocket, old_websocket_loop)
             debug_log("已將舊 WebSocket 連接轉移到新會話")
         else:
             # 沒有舊連接，標記需要發送會話更新通知（當新 WebSocket 連接建立時）
@@ -435,36 +577,32 @@ class WebUIManager:
     def _merge_tabs_to_global(self, session_tabs: dict):
         """將會話的標籤頁狀態合併到全局狀態"""
         current_time = time.time()
-        expired_threshold = 60  # 60秒過期閾值
 
         # 清理過期的全局標籤頁
-        self.global_active_tabs = {
-            tab_id: tab_info
-            for tab_id, tab_info in self.global_active_tabs.items()
-            if current_time - tab_info.get("last_seen", 0) <= expired_threshold
-        }
+        self._prune_expired_tabs(current_time)
 
         # 合併會話標籤頁到全局
         for tab_id, tab_info in session_tabs.items():
-            if current_time - tab_info.get("last_seen", 0) <= expired_threshold:
+            if current_time - tab_info.get("last_seen", 0) <= TAB_EXPIRED_SEC:
                 self.global_active_tabs[tab_id] = tab_info
 
         debug_log(f"合併標籤頁狀態，全局活躍標籤頁數量: {len(self.global_active_tabs)}")
 
     def get_global_active_tabs_count(self) -> int:
         """獲取全局活躍標籤頁數量"""
-        current_time = time.time()
-        expired_threshold = 60
-
         # 清理過期標籤頁並返回數量
-        valid_tabs = {
-            tab_id: tab_info
-            for tab_id, tab_info in self.global_active_tabs.items()
-            if current_time - tab_info.get("last_seen", 0) <= expired_threshold
-        }
+        self._prune_expired_tabs(time.time())
+        return len(self.global_active_tabs)
 
-        self.global_active_tabs = valid_tabs
-        return len(valid_tabs)
+    def _prune_expired_tabs(self, current_time: float):
+        """就地移除過期的全局標籤頁"""
+        expired = [
+            tab_id
+            for tab_id, tab_info in self.global_active_tabs.items()
+            if current_time - tab_info.get("last_seen", 0) > TAB_EXPIRED_SEC
+        ]
+        for tab_id in expired:
+            del self.global_active_tabs[tab_id]
 
     async def broadcast_to_active_tabs(self, message: dict):
         """向所有活躍標籤頁廣播消息"""
@@ -472,143 +610,127 @@ class WebUIManager:
             debug_log("沒有活躍的 WebSocket 連接，無法廣播消息")
             return
 
+        # 放入會話發送佇列，由背景任務發送，避免慢客戶端阻塞呼叫方
+        self.current_session.enqueue_message(message)
+        debug_log(f"已排入廣播消息到活躍標籤頁: {message.get('type', 'unknown')}")
+
+    def _bind_server_socket(self) -> socket.socket:
+        """綁定伺服器監聽 socket，端口被佔用時改用替代端口或由系統分配"""
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        original_port = self.port
+
+        def bind(port: int) -> socket.socket:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            try:
+                # Windows 的 SO_REUSEADDR 允許搶佔端口，僅在其他平台啟用
+                if sys.platform != "win32":
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                sock.bind((self.host, port))
+            except OSError:
+                sock.close()
+                raise
+            return sock
+
         try:
-            await self.current_session.websocket.send_json(message)
-            debug_log(f"已廣播消息到活躍標籤頁: {message.get('type', 'unknown')}")
-        except Exception as e:
-            debug_log(f"廣播消息失敗: {e}")
+            sock = bind(self.port)
+        except OSError:
+            debug_log(f"端口 {self.port} 已被佔用，自動尋找替代端口")
 
-    def start_server(self):
-        """啟動 Web 伺服器（優化版本，支援並行初始化）"""
+            # 查找占用端口的進程信息
+            process_info = PortManager.find_process_using_port(self.port)
+            if process_info:
+                debug_log(
+                    f"端口 {self.port} 被進程 {process_info['name']} "
+                    f"(PID: {process_info['pid']}) 佔用"
+                )
+
+            try:
+                sock = bind(
+                    PortManager.find_free_port_enhanced(
+                        preferred_port=self.port,
+                        auto_cleanup=False,  # 不自動清理其他進程
+                        host=self.host,
+                    )
+                )
+            except (OSError, RuntimeError):
+                # 替代端口也不可用時，由系統原子地分配端口
+                sock = bind(0)
 
-        def run_server_with_retry():
-            max_retries = 5
-            retry_count = 0
-            original_port = self.port
+        sock.setblocking(False)
+        self.port = sock.getsockname()[1]
+        if self.port != original_port:
+            debug_log(f"自動切換端口: {original_port} → {self.port}")
+        return sock
 
-            while retry_count < max_retries:
-                try:
-                    # 在嘗試啟動前先檢查端口是否可用
-                    if not PortManager.is_port_available(self.host, self.port):
-                        debug_log(f"端口 {self.port} 已被佔用，自動尋找替代端口")
-
-                        # 查找占用端口的進程信息
-                        process_info = PortManager.find_process_using_port(self.port)
-                        if process_info:
-                            debug_log(
-                                f"端口 {self.port} 被進程 {process_info['name']} "
-                                f"(PID: {process_info['pid']}) 佔用"
-                            )
-
-                        # 自動尋找新端口
-                        try:
-                            new_port = PortManager.find_free_port_enhanced(
-                                preferred_port=self.port,
-                                auto_cleanup=False,  # 不自動清理其他進程
-                                host=self.host,
-                            )
-                            debug_log(f"自動切換端口: {self.port} → {new_port}")
-                            self.port = new_port
-                        except RuntimeError as port_error:
-                            error_id = ErrorHandler.log_error_with_context(
-                                port_error,
-                                context={
-                                    "operation": "端口查找",
-                                    "original_port": original_port,
-                                    "current_port": self.port,
-                                },
-                                error_type=ErrorType.NETWORK,
-                            )
-                            debug_log(
-                                f"無法找到可用端口 [錯誤ID: {error_id}]: {port_error}"
-                            )
-                            raise RuntimeError(
-                                f"無法找到可用端口，原始端口 {original_port} 被佔用"
-                            ) from port_error
+    def start_server(self):
+        """啟動 Web 伺服器（優化版本，支援並行初始化）"""
+        # 先在當前線程綁定監聽 socket，確保返回前 self.port 已確定
+        sock = self._bind_server_socket()
 
+        def run_server():
+            try:
+                debug_log(f"啟動伺服器在 {self.host}:{self.port}")
+                if not WEBSOCKETS_SPEEDUPS_AVAILABLE:
                     debug_log(
-                        f"嘗試啟動伺服器在 {self.host}:{self.port} (嘗試 {retry_count + 1}/{max_retries})"
+                        "警告：websockets C 擴展不可用，WebSocket 幀掩碼將使用純 Python 實作"
                     )
 
-                    config = uvicorn.Config(
-                        app=self.app,
-                        host=self.host,
-                        port=self.port,
-                        log_level="warning",
-                        access_log=False,
-                    )
+                config = uvicorn.Config(
+                    app=self.app,
+                    host=self.host,
+                    port=self.port,
+                    log_level="warning",
+                    access_log=False,
+                    ws_ping_interval=WS_PING_INTERVAL,
+                    ws_ping_timeout=WS_PING_TIMEOUT,
+                )
 
-                    server_instance = uvicorn.Server(config)
+                server_instance = _ReadySignalServer(config, self._ready_event)
 
-                    # 創建事件循環並啟動服務器
-                    async def serve_with_async_init(server=server_instance):
-                        # 在服務器啟動的同時進行異步初始化
-                        server_task = asyncio.create_task(server.serve())
-                        init_task = asyncio.create_task(self._init_async_components())
+                # 創建事件循環並啟動服務器
+                async def serve_with_async_init(server=server_instance):
+                    # 在服務器啟動的同時進行異步初始化
+                    server_task = asyncio.create_task(server.serve(sockets=[sock]))
+                    init_task = asyncio.create_task(self._init_async_components())
+                    stats_task = asyncio.create_task(self._stats_flusher())
 
-                        # 等待兩個任務完成
+                    # 等待兩個任務完成
+                    try:
                         await asyncio.gather(
                             server_task, init_task, return_exceptions=True
                         )
+                    finally:
+                        stats_task.cancel()
 
-                    asyncio.run(serve_with_async_init())
-
-                    # 成功啟動，顯示最終使用的端口
-                    if self.port != original_port:
-                        debug_log(
-                            f"✅ 服務器成功啟動在替代端口 {self.port} (原端口 {original_port} 被佔用)"
-                        )
+                loop_factory = uvloop.new_event_loop if uvloop else None
+                with asyncio.Runner(loop_factory=loop_factory) as runner:
+                    runner.run(serve_with_async_init())
 
-                    break
-
-                except OSError as e:
-                    if e.errno in {
-                        10048,
-                        98,
-                    }:  # Windows: 10048, Linux: 98 (位址已在使用中)
-                        retry_count += 1
-                        if retry_count < max_retries:
-                            debug_log(
-                                f"端口 {self.port} 啟動失敗 (OSError)，嘗試下一個端口"
-                            )
-                            # 嘗試下一個端口
-                            self.port = self.port + 1
-                        else:
-                            debug_log("已達到最大重試次數，無法啟動伺服器")
-                            break
-                    else:
-                        # 使用統一錯誤處理
-                        error_id = ErrorHandler.log_error_with_context(
-                            e,
-                            context={
-                                "operation": "伺服器啟動",
-                                "host": self.host,
-                                "port": self.port,
-                            },
-                            error_type=ErrorType.NETWORK,
-                        )
-                        debug_log(f"伺服器啟動錯誤 [錯誤ID: {error_id}]: {e}")
-                        break
-                except Exception as e:
-                    # 使用統一錯誤處理
-                    error_id = ErrorHandler.log_error_with_context(
-                        e,
-                        context={
-                            "operation": "伺服器運行",
-                            "host": self.host,
-                            "port": self.port,
-                        },
-                        error_type=ErrorType.SYSTEM,
-                    )
-                    debug_log(f"伺服器運行錯誤 [錯誤ID: {error_id}]: {e}")
-                    break
+            except Exception as e:
+                # 使用統一錯誤處理
+                error_id = ErrorHandler.log_error_with_context(
+                    e,
+                    context={
+                        "operation": "伺服器運行",
+                        "host": self.host,
+                        "port": self.port,
+                    },
+                    error_type=ErrorType.SYSTEM,
+                )
+                debug_log(f"伺服器運行錯誤 [錯誤ID: {error_id}]: {e}")
+            finally:
+                sock.close()
 
         # 在新線程中啟動伺服器
-        self.server_thread = threading.Thread(target=run_server_with_retry, daemon=True)
+        self._ready_event.clear()
+        self.server_thread = threading.Thread(target=run_server, daemon=True)
         self.server_thread.start()
 
-        # 等待伺服器啟動
-        time.sleep(2)
+        # 等待伺服器就緒
+        if not self._ready_event.wait(timeout=SERVER_READY_TIMEOUT):
+            debug_log(
+                f"伺服器在 {SERVER_READY_TIMEOUT} 秒內未就緒 ({self.host}:{self.port})"
+            )
 
     def open_browser(self, url: str):
         """開啟瀏覽器"""
@@ -648,14 +770,21 @@ class WebUIManager:
 
             # 沒有活躍標籤頁，開啟新瀏覽器視窗
             debug_log("沒有檢測到活躍標籤頁，開啟新瀏覽器視窗")
-            self.open_browser(url)
+            self._open_browser_in_background(url)
             return False
 
         except Exception as e:
             debug_log(f"智能瀏覽器開啟失敗，回退到普通開啟：{e}")
-            self.open_browser(url)
+            self._open_browser_in_background(url)
             return False
 
+    def _open_browser_in_background(self, url: str):
+        """在工作線程中開啟瀏覽器，不阻塞事件循環，也不延後回饋等待的開始"""
+        task = asyncio.create_task(asyncio.to_thread(self.open_browser, url))
+        # 保留任務引用，避免任務在完成前被回收
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
     async def launch_desktop_app(self, url: str) -> bool:
         """
         啟動桌面應用程式
@@ -681,8 +810,6 @@ class WebUIManager:
                     debug_log("發佈包中未找到桌面應用程式模組，嘗試開發環境...")
 
                 # 回退到開發環境路徑
-                import sys
-
                 project_root = os.path.dirname(
                     os.path.dirname(os.path.dirname(__file__))
                 )
@@ -768,21 +895,10 @@ class WebUIManager:
                 debug_log("沒有活躍的WebSocket連接，無法發送刷新通知")
                 return False
 
-            # 構建刷新通知消息
-            refresh_message = {
-                "type": "session_updated",
-                "action": "new_session_created",
-                "messageCode": "session.created",
-                "session_info": {
-                    "session_id": self.current_session.session_id,
-                    "project_directory": self.current_session.project_directory,
-                    "summary": self.current_session.summary,
-                    "status": self.current_session.status.value,
-                },
-            }
-
             # 發送刷新通知
-            await self.current_session.websocket.send_json(refresh_message)
+            await self.current_session.websocket.send_text(
+                self.get_session_update_payload(self.current_session)
+            )
             debug_log(f"已向現有標籤頁發送刷新通知: {self.current_session.session_id}")
 
             # 簡單等待一下讓消息發送完成
@@ -794,6 +910,34 @@ class WebUIManager:
             debug_log(f"發送刷新通知失敗: {e}")
             return False
 
+    def get_session_update_payload(self, session: WebFeedbackSession) -> str:
+        """獲取會話更新通知的 JSON 文本，內容未變時重用已序列化的結果"""
+        cache_key = (
+            session.session_id,
+            session.project_directory,
+            session.summary,
+            session.status.value,
+        )
+        cached = session._update_payload_cache
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
+
+        payload = encode_message(
+            {
+                "type": "session_updated",
+                "action": "new_session_created",
+                "messageCode": get_message_code("new_session_created"),
+                "session_info": {
+                    "session_id": session.session_id,
+                    "project_directory": session.project_directory,
+                    "summary": session.summary,
+                    "status": session.status.value,
+                },
+            }
+        )
+        session._update_payload_cache = (cache_key, payload)
+        return payload
+
     async def _check_active_tabs(self) -> bool:
         """檢查是否有活躍標籤頁 - 使用分層檢測機制"""
         try:
@@ -803,7 +947,7 @@ class WebUIManager:
                 return False
 
             # 檢查心跳（如果有心跳記錄）
-            last_heartbeat = getattr(self.current_session, "last_heartbeat", None)
+            last_heartbeat = self.current_session.last_heartbeat
             if last_heartbeat:
                 heartbeat_age = time.time() - last_heartbeat
                 if heartbeat_age > 10:  # 超過 10 秒沒有心跳
@@ -819,28 +963,22 @@ class WebUIManager:
                 websocket = self.current_session.websocket
 
                 # 檢查連接是否已關閉
-                if hasattr(websocket, "client_state"):
-                    try:
-                        # 嘗試從 starlette 導入（FastAPI 基於 Starlette）
-                        import starlette.websockets  # type: ignore[import-not-found]
-
-                        if hasattr(starlette.websockets, "WebSocketState"):
-                            WebSocketState = starlette.websockets.WebSocketState
-                            if websocket.client_state != WebSocketState.CONNECTED:
-                                debug_log(
-                                    f"準確檢測：WebSocket 狀態不是 CONNECTED，而是 {websocket.client_state}"
-                                )
-                                # 清理死連接
-                                self.current_session.websocket = None
-                                return False
-                    except ImportError:
-                        # 如果導入失敗，使用替代方法
-                        debug_log("無法導入 WebSocketState，使用替代方法檢測連接")
-                        # 跳過狀態檢查，直接測試連接
+                if (
+                    hasattr(websocket, "client_state")
+                    and websocket.client_state != WebSocketState.CONNECTED
+                ):
+                    debug_log(
+                        f"準確檢測：WebSocket 狀態不是 CONNECTED，而是 {websocket.client_state}"
+                    )
+                    # 清理死連接
+                    self.current_session.websocket = None
+                    return False
 
                 # 如果連接看起來是活的，嘗試發送 ping（非阻塞）
                 # 注意：FastAPI WebSocket 沒有內建的 ping 方法，這裡使用自定義消息
-                await websocket.send_json({"type": "ping", "timestamp": time.time()})
+                await send_message(
+                    websocket, {"type": "ping", "timestamp": time.time()}
+                )
                 debug_log("準確檢測：成功發送 ping 消息，連接是活躍的")
                 return True
 
@@ -859,6 +997,19 @@ class WebUIManager:
         """獲取伺服器 URL"""
         return f"http://{self.host}:{self.port}"
 
+    def _drop_sessions(self, session_ids: set[str], reason: str) -> None:
+        """一次性從會話字典中移除指定會話，必要時清空當前活躍會話"""
+        self.sessions = {
+            sid: session
+            for sid, session in self.sessions.items()
+            if sid not in session_ids
+        }
+
+        # 如果清理的是當前活躍會話，清空當前會話
+        if self.current_session and self.current_session.session_id in session_ids:
+            self.current_session = None
+            debug_log(reason)
+
     def cleanup_expired_sessions(self) -> int:
         """清理過期會話"""
         cleanup_start_time = time.time()
@@ -866,27 +1017,18 @@ class WebUIManager:
 
         # 掃描過期會話
         for session_id, session in self.sessions.items():
-            if session.is_expired():
+            if session.is_expired(cleanup_start_time):
                 expired_sessions.append(session_id)
 
         # 批量清理過期會話
-        cleaned_count = 0
+        cleaned_ids: set[str] = set()
         for session_id in expired_sessions:
             try:
                 if session_id in self.sessions:
                     session = self.sessions[session_id]
                     # 使用增強清理方法
                     session._cleanup_sync_enhanced(CleanupReason.EXPIRED)
-                    del self.sessions[session_id]
-                    cleaned_count += 1
-
-                    # 如果清理的是當前活躍會話，清空當前會話
-                    if (
-                        self.current_session
-                        and self.current_session.session_id == session_id
-                    ):
-                        self.current_session = None
-                        debug_log("清空過期的當前活躍會話")
+                    cleaned_ids.add(session_id)
 
             except Exception as e:
                 error_id = ErrorHandler.log_error_with_context(
@@ -896,13 +1038,18 @@ class WebUIManager:
                 )
                 debug_log(f"清理過期會話 {session_id} 失敗 [錯誤ID: {error_id}]: {e}")
 
+        # 一次性移除已清理的會話
+        cleaned_count = len(cleaned_ids)
+        if cleaned_ids:
+            self._drop_sessions(cleaned_ids, "清空過期的當前活躍會話")
+
         # 更新統計
         cleanup_duration = time.time() - cleanup_start_time
         self.cleanup_stats.update(
             {
                 "total_cleanups": self.cleanup_stats["total_cleanups"] + 1,
                 "expired_cleanups": self.cleanup_stats["expired_cleanups"] + 1,
-                "last_cleanup_time": datetime.now().isoformat(),
+                "last_cleanup_time_ts": time.time(),
                 "total_cleanup_duration": self.cleanup_stats["total_cleanup_duration"]
                 + cleanup_duration,
                 "sessions_cleaned": self.cleanup_stats["sessions_cleaned"]
@@ -934,17 +1081,13 @@ class WebUIManager:
                 continue
 
             # 優先清理已完成或錯誤狀態的會話
-            if session.status in [
-                SessionStatus.COMPLETED,
-                SessionStatus.ERROR,
-                SessionStatus.TIMEOUT,
-            ]:
+            if session.status in MEMORY_PRESSURE_CLEANUP_STATUSES:
                 sessions_to_clean.append((session_id, session, 1))  # 高優先級
             elif session.status == SessionStatus.FEEDBACK_SUBMITTED:
                 # 已提交反饋但空閒時間較長的會話
-                if session.get_idle_time() > 300:  # 5分鐘空閒
+                if session.get_idle_time(cleanup_start_time) > IDLE_SUBMITTED_SEC:
                     sessions_to_clean.append((session_id, session, 2))  # 中優先級
-            elif session.get_idle_time() > 600:  # 10分鐘空閒
+            elif session.get_idle_time(cleanup_start_time) > IDLE_GENERAL_SEC:
                 sessions_to_clean.append((session_id, session, 3))  # 低優先級
 
         # 按優先級排序
@@ -954,23 +1097,14 @@ class WebUIManager:
         max_cleanup = min(
             len(sessions_to_clean), 5 if not force else len(sessions_to_clean)
         )
-        cleaned_count = 0
+        cleaned_ids: set[str] = set()
 
         for i in range(max_cleanup):
             session_id, session, priority = sessions_to_clean[i]
             try:
                 # 使用增強清理方法
                 session._cleanup_sync_enhanced(CleanupReason.MEMORY_PRESSURE)
-                del self.sessions[session_id]
-                cleaned_count += 1
-
-                # 如果清理的是當前活躍會話，清空當前會話
-                if (
-                    self.current_session
-                    and self.current_session.session_id == session_id
-                ):
-                    self.current_session = None
-                    debug_log("因內存壓力清空當前活躍會話")
+                cleaned_ids.add(session_id)
 
             except Exception as e:
                 error_id = ErrorHandler.log_error_with_context(
@@ -982,6 +1116,11 @@ class WebUIManager:
                     f"內存壓力清理會話 {session_id} 失敗 [錯誤ID: {error_id}]: {e}"
                 )
 
+        # 一次性移除已清理的會話
+        cleaned_count = len(cleaned_ids)
+        if cleaned_ids:
+            self._drop_sessions(cleaned_ids, "因內存壓力清空當前活躍會話")
+
         # 更新統計
         cleanup_duration = time.time() - cleanup_start_time
         self.cleanup_stats.update(
@@ -991,7 +1130,7 @@ class WebUIManager:
                     "memory_pressure_cleanups"
                 ]
                 + 1,
-                "last_cleanup_time": datetime.now().isoformat(),
+                "last_cleanup_time_ts": time.time(),
                 "total_cleanup_duration": self.cleanup_stats["total_cleanup_duration"]
                 + cleanup_duration,
                 "sessions_cleaned": self.cleanup_stats["sessions_cleaned"]
@@ -1008,7 +1147,14 @@ class WebUIManager:
 
     def get_session_cleanup_stats(self) -> dict:
         """獲取會話清理統計"""
+        now = time.time()
         stats = self.cleanup_stats.copy()
+        last_cleanup_ts = stats.pop("last_cleanup_time_ts")
+        stats["last_cleanup_time"] = (
+            datetime.fromtimestamp(last_cleanup_ts).isoformat()
+            if last_cleanup_ts
+            else None
+        )
         stats.update(
             {
                 "active_sessions": len(self.sessions),
@@ -1016,35 +1162,36 @@ class WebUIManager:
                 if self.current_session
                 else None,
                 "expired_sessions": sum(
-                    1 for s in self.sessions.values() if s.is_expired()
+                    1 for s in self.sessions.values() if s.is_expired(now)
                 ),
                 "idle_sessions": sum(
-                    1 for s in self.sessions.values() if s.get_idle_time() > 300
+                    1 for s in self.sessions.values() if s.get_idle_time(now) > 300
                 ),
                 "memory_usage_mb": 0,  # 將在下面計算
             }
         )
 
         # 計算內存使用（如果可能）
-        try:
-            import psutil
+        import psutil
 
+        try:
             process = psutil.Process()
             stats["memory_usage_mb"] = round(
                 process.memory_info().rss / (1024 * 1024), 2
             )
-        except:
+        except (psutil.Error, OSError):
             pass
 
         return stats
 
     def _scan_expired_sessions(self) -> list[str]:
         """掃描過期會話ID列表"""
-        expired_sessions = []
-        for session_id, session in self.sessions.items():
-            if session.is_expired():
-                expired_sessions.append(session_id)
-        return expired_sessions
+        now = time.time()
+        return [
+            session_id
+            for session_id, session in self.sessions.items()
+            if session.is_expired(now)
+        ]
 
     def stop(self):
         """停止 Web UI 服務"""
@@ -1067,7 +1214,7 @@ class WebUIManager:
             {
                 "total_cleanups": self.cleanup_stats["total_cleanups"] + 1,
                 "manual_cleanups": self.cleanup_stats["manual_cleanups"] + 1,
-                "last_cleanup_time": datetime.now().isoformat(),
+                "last_cleanup_time_ts": time.time(),
                 "total_cleanup_duration": self.cleanup_stats["total_cleanup_duration"]
                 + cleanup_duration,
                 "sessions_cleaned": self.cleanup_stats["sessions_cleaned"]
@@ -7,7 +7,18 @@ Web UI 資料模型模組
 """
 
 from .feedback_result import FeedbackResult
-from .feedback_session import CleanupReason, SessionStatus, WebFeedbackSession
+from .feedback_session import (
+    CleanupReason,
+    FeedbackTimeoutError,
+    SessionStatus,
+    WebFeedbackSession,
+)
 
 
-__all__ = ["CleanupReason", "FeedbackResult", "SessionStatus", "WebFeedbackSession"]
+__all__ = [
+    "CleanupReason",
+    "FeedbackResult",
+    "FeedbackTimeoutError",
+    "SessionStatus",
+    "WebFeedbackSession",
+]
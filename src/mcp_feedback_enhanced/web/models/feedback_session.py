@@ -5,28 +5,42 @@ Web 回饋會話模型
 
 管理 Web 回饋會話的資料和邏輯。
 
-注意：此文件中的 subprocess 調用已經過安全處理，使用 shlex.split() 解析命令
-並禁用 shell=True 以防止命令注入攻擊。
+注意：此文件中的子進程調用已經過安全處理，使用 shlex.split() 解析命令
+並以 asyncio.create_subprocess_exec 直接執行（不經過 shell）以防止命令注入攻擊。
 """
 
 import asyncio
-import base64
+import binascii
+import heapq
+import inspect
+import itertools
+import locale
 import shlex
-import subprocess
 import threading
 import time
+from collections import deque
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from enum import Enum
+from functools import cache
 from pathlib import Path
 from typing import Any
 
-from fastapi import WebSocket
+import psutil
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
 
+from ...debug import is_debug_enabled
 from ...debug import web_debug_log as debug_log
 from ...utils.error_handler import ErrorHandler, ErrorType
-from ...utils.resource_manager import get_resource_manager, register_process
+from ...utils.resource_manager import (
+    create_temp_file,
+    get_resource_manager,
+    register_process,
+)
 from ..constants import get_message_code
+from ..utils.ws_messages import encode_message, send_message
 
 
 class SessionStatus(Enum):
@@ -52,22 +66,118 @@ class CleanupReason(Enum):
     SHUTDOWN = "shutdown"  # 系統關閉清理
 
 
+# 狀態集合（模組級常量，避免每次檢查都建立列表）
+ACTIVE_STATUSES = frozenset(
+    {SessionStatus.WAITING, SessionStatus.ACTIVE, SessionStatus.FEEDBACK_SUBMITTED}
+)
+TERMINAL_STATUSES = frozenset(
+    {
+        SessionStatus.COMPLETED,
+        SessionStatus.ERROR,
+        SessionStatus.TIMEOUT,
+        SessionStatus.EXPIRED,
+    }
+)
+PROCEEDABLE_STATUSES = frozenset(
+    {SessionStatus.WAITING, SessionStatus.FEEDBACK_SUBMITTED}
+)
+# 錯誤或超時狀態持續超過 ERROR_EXPIRY_SEC 秒即視為過期
+ERROR_EXPIRY_STATUSES = frozenset({SessionStatus.ERROR, SessionStatus.TIMEOUT})
+ERROR_EXPIRY_SEC = 300
+
+# 狀態流轉路徑：單向流轉，終態沒有下一步
+NEXT_STATUS: dict[SessionStatus, SessionStatus] = {
+    SessionStatus.WAITING: SessionStatus.ACTIVE,
+    SessionStatus.ACTIVE: SessionStatus.FEEDBACK_SUBMITTED,
+    SessionStatus.FEEDBACK_SUBMITTED: SessionStatus.COMPLETED,
+}
+DEFAULT_STATUS_MESSAGES = {
+    SessionStatus.ACTIVE: "會話已啟動",
+    SessionStatus.FEEDBACK_SUBMITTED: "用戶已提交反饋",
+    SessionStatus.COMPLETED: "會話已完成",
+}
+
+# 清理原因對應的前端訊息代碼鍵與清理後狀態（未列出的原因視為完成）
+CLEANUP_MESSAGE_KEYS = {
+    CleanupReason.TIMEOUT: "TIMEOUT_CLEANUP",
+    CleanupReason.EXPIRED: "EXPIRED_CLEANUP",
+    CleanupReason.MEMORY_PRESSURE: "MEMORY_PRESSURE_CLEANUP",
+    CleanupReason.MANUAL: "MANUAL_CLEANUP",
+    CleanupReason.ERROR: "ERROR_CLEANUP",
+    CleanupReason.SHUTDOWN: "SHUTDOWN_CLEANUP",
+}
+CLEANUP_FINAL_STATUS = {
+    CleanupReason.EXPIRED: SessionStatus.EXPIRED,
+    CleanupReason.TIMEOUT: SessionStatus.TIMEOUT,
+    CleanupReason.ERROR: SessionStatus.ERROR,
+}
+
 # 常數定義
 MAX_IMAGE_SIZE = 1 * 1024 * 1024  # 1MB 圖片大小限制
-SUPPORTED_IMAGE_TYPES = {
-    "image/png",
-    "image/jpeg",
-    "image/jpg",
-    "image/gif",
-    "image/bmp",
-    "image/webp",
-}
+SUPPORTED_IMAGE_TYPES = frozenset(
+    {
+        "image/png",
+        "image/jpeg",
+        "image/jpg",
+        "image/gif",
+        "image/bmp",
+        "image/webp",
+    }
+)
+REQUIRED_IMAGE_KEYS = frozenset({"name", "data", "size"})
+# 命令中禁止出現的 shell 特性與危險命令（命令以參數列表直接執行，不經過 shell）
+DANGEROUS_COMMAND_PATTERNS = (
+    ";",
+    "&&",
+    "||",
+    "|",
+    ">",
+    "<",
+    "`",
+    "$(",
+    "rm -rf",
+    "del /f",
+    "format",
+    "fdisk",
+)
 TEMP_DIR = Path.home() / ".cache" / "interactive-feedback-mcp-web"
+SEND_QUEUE_MAXSIZE = 64  # 廣播發送佇列上限，滿時丟棄最舊消息
+COMMAND_OUTPUT_FLUSH_DELAY = 0.02  # 命令輸出批次收集時間（秒）
+COMMAND_OUTPUT_BATCH_SIZE = 16 * 1024  # 達到此大小立即發送命令輸出
+COMMAND_OUTPUT_MAX_FRAME = 64 * 1024  # 單一命令輸出幀的最大字元數
+COMMAND_OUTPUT_LINE_LIMIT = 1024 * 1024  # 命令輸出單行最大字節數
+COMMAND_TERMINATE_TIMEOUT = 5  # 終止命令後等待多久強制結束（秒）
+MAX_COMMAND_LOG_LINES = 10000  # 命令日誌保留的最大行數，超出時丟棄最舊的行
+TIMER_CALLBACK_WORKERS = 4  # 執行會話定時回調的工作線程數
 
 # 訊息代碼現在從統一的常量文件導入
 # 使用 get_message_code 函數來獲取訊息代碼
 
 
+@cache
+def _ensure_temp_dir() -> None:
+    """建立臨時目錄，僅在首次調用時執行"""
+    try:
+        TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        debug_log(f"建立臨時目錄失敗: {e}")
+
+
+@cache
+def _current_process() -> psutil.Process:
+    """當前進程的 psutil 句柄，每個進程只建立一次"""
+    return psutil.Process()
+
+
+def _current_process_rss() -> int:
+    """取得當前進程的常駐內存大小，無法取得時返回 0"""
+    try:
+        rss: int = _current_process().memory_info().rss
+        return rss
+    except (psutil.Error, OSError):
+        return 0
+
+
 def _safe_parse_command(command: str) -> list[str]:
     """
     安全解析命令字符串，避免 shell 注入攻擊
@@ -82,30 +192,15 @@ def _safe_parse_command(command: str) -> list[str]:
         ValueError: 如果命令包含不安全的字符
     """
     try:
-        # 使用 shlex 安全解析命令
-        parsed = shlex.split(command)
-
-        # 基本安全檢查：禁止某些危險字符和命令
-        dangerous_patterns = [
-            ";",
-            "&&",
-            "||",
-            "|",
-            ">",
-            "<",
-            "`",
-            "$(",
-            "rm -rf",
-            "del /f",
-            "format",
-            "fdisk",
-        ]
-
+        # 基本安全檢查：先拒絕含危險模式的命令，再進行解析
         command_lower = command.lower()
-        for pattern in dangerous_patterns:
+        for pattern in DANGEROUS_COMMAND_PATTERNS:
             if pattern in command_lower:
                 raise ValueError(f"命令包含不安全的模式: {pattern}")
 
+        # 使用 shlex 安全解析命令
+        parsed = shlex.split(command)
+
         if not parsed:
             raise ValueError("空命令")
 
@@ -116,9 +211,210 @@ def _safe_parse_command(command: str) -> list[str]:
         raise ValueError(f"無法安全解析命令: {e}") from e
 
 
+class _ScheduledCallback:
+    """排程器中的一次性回調，提供與 threading.Timer 相同的 cancel/is_alive 介面"""
+
+    __slots__ = ("_cancelled", "_fired", "callback", "deadline")
+
+    def __init__(self, deadline: float, callback: Callable[[], None]):
+        self.deadline = deadline
+        self.callback = callback
+        self._cancelled = False
+        self._fired = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def is_alive(self) -> bool:
+        return not (self._cancelled or self._fired)
+
+
+class _SessionTimerScheduler:
+    """
+    進程內共用的會話定時器
+
+    所有會話的截止時間放在同一個最小堆中，由單一守護線程維護，
+    取代每個會話各自的 threading.Timer 線程。已取消的項目在到達堆頂時丟棄。
+    到期的回調交給工作線程池執行，避免耗時的清理延誤其他會話的定時器。
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int, _ScheduledCallback]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    def schedule(
+        self, delay: float, callback: Callable[[], None]
+    ) -> _ScheduledCallback:
+        """在 delay 秒後於工作線程中執行 callback"""
+        handle = _ScheduledCallback(time.monotonic() + delay, callback)
+        with self._condition:
+            heapq.heappush(self._heap, (handle.deadline, next(self._counter), handle))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="SessionTimerScheduler", daemon=True
+                )
+                self._thread.start()
+            elif self._heap[0][2] is handle:
+                # 新的最早截止時間，喚醒排程線程重新計算等待時間
+                self._condition.notify()
+        return handle
+
+    def _next_due(self) -> _ScheduledCallback:
+        """等待並取出下一個到期的回調（需持有鎖）"""
+        heap = self._heap
+        while True:
+            while heap and not heap[0][2].is_alive():
+                heapq.heappop(heap)
+            if not heap:
+                self._condition.wait()
+                continue
+            remaining = heap[0][0] - time.monotonic()
+            if remaining <= 0:
+                handle = heapq.heappop(heap)[2]
+                handle._fired = True
+                return handle
+            self._condition.wait(remaining)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                handle = self._next_due()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=TIMER_CALLBACK_WORKERS,
+                    thread_name_prefix="SessionTimerCallback",
+                )
+            self._executor.submit(self._invoke, handle.callback)
+
+    @staticmethod
+    def _invoke(callback: Callable[[], None]) -> None:
+        try:
+            callback()
+        except Exception as e:
+            debug_log(f"會話定時回調執行失敗: {e}")
+
+
+_timer_scheduler = _SessionTimerScheduler()
+
+
+class FeedbackTimeoutError(TimeoutError):
+    """等待用戶回饋超時，錯誤訊息僅在讀取時才格式化"""
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def __str__(self) -> str:
+        return f"等待用戶回饋超時（{self.timeout}秒），介面已自動關閉"
+
+
+class _ThreadSafeAsyncEvent:
+    """可跨線程設置的 asyncio 事件
+
+    等待方在自身事件循環中協作式等待，不佔用線程；set() 可從任意線程
+    （WebSocket 事件循環、計時器線程等）調用，會轉交到等待方的事件循環。
+    """
+
+    def __init__(self):
+        self._flag = False
+        self._event: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def is_set(self) -> bool:
+        return self._flag
+
+    def set(self) -> None:
+        with self._lock:
+            self._flag = True
+            event, loop = self._event, self._loop
+
+        if event is None or loop is None:
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is loop:
+            event.set()
+        else:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 等待方的事件循環已關閉
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._flag = False
+            if self._event is not None:
+                self._event.clear()
+
+    async def wait(self) -> bool:
+        with self._lock:
+            if self._flag:
+                return True
+            # 事件在首次等待時於當前事件循環中建立
+            loop = asyncio.get_running_loop()
+            if self._event is None or self._loop is not loop:
+                self._event = asyncio.Event()
+                self._loop = loop
+            event = self._event
+
+        await event.wait()
+        return True
+
+
 class WebFeedbackSession:
     """Web 回饋會話管理"""
 
+    # 固定屬性集合，省去每個實例的 __dict__
+    __slots__ = (
+        "_cleanup_done",
+        "_cleanup_lock",
+        "_process_loop",
+        "_send_queue",
+        "_send_ready",
+        "_sender_loop",
+        "_sender_task",
+        "_status_info_cache",
+        "_status_update_cache",
+        "_status_update_sent",
+        "_update_payload_cache",
+        "_websocket_loop",
+        "active_tabs",
+        "auto_cleanup_delay",
+        "cleanup_callbacks",
+        "cleanup_stats",
+        "cleanup_timer",
+        "command_logs",
+        "created_at",
+        "feedback_completed",
+        "feedback_result",
+        "images",
+        "last_activity",
+        "last_heartbeat",
+        "max_idle_time",
+        "process",
+        "project_directory",
+        "resource_manager",
+        "session_id",
+        "settings",
+        "status",
+        "status_message",
+        "summary",
+        "user_messages",
+        "user_timeout_enabled",
+        "user_timeout_seconds",
+        "user_timeout_timer",
+        "websocket",
+    )
+
     def __init__(
         self,
         session_id: str,
@@ -134,11 +430,16 @@ class WebFeedbackSession:
         self.feedback_result: str | None = None
         self.images: list[dict] = []
         self.settings: dict[str, Any] = {}  # 圖片設定
-        self.feedback_completed = threading.Event()
-        self.process: subprocess.Popen | None = None
-        self.command_logs: list[str] = []
+        self.feedback_completed = _ThreadSafeAsyncEvent()
+        self.process: asyncio.subprocess.Process | None = None
+        self._process_loop: asyncio.AbstractEventLoop | None = None
+        self.command_logs: deque[str] = deque(maxlen=MAX_COMMAND_LOG_LINES)
         self.user_messages: list[dict] = []  # 用戶消息記錄
         self._cleanup_done = False  # 防止重複清理
+        # 清理可能同時來自定時線程與事件循環，以鎖保護 _cleanup_done 的檢查與設置
+        self._cleanup_lock = threading.Lock()
+        # 附加 WebSocket 的事件循環（uvicorn），供定時線程提交異步清理
+        self._websocket_loop: asyncio.AbstractEventLoop | None = None
         # 移除語言設定，改由前端處理
 
         # 新增：會話狀態管理
@@ -147,18 +448,19 @@ class WebFeedbackSession:
         # 統一使用 time.time() 以避免時間基準不一致
         self.created_at = time.time()
         self.last_activity = self.created_at
-        self.last_heartbeat = None  # 記錄最後一次心跳時間
+        self.last_heartbeat: float | None = None  # 記錄最後一次心跳時間
 
         # 新增：自動清理配置
         self.auto_cleanup_delay = auto_cleanup_delay  # 自動清理延遲時間（秒）
         self.max_idle_time = max_idle_time  # 最大空閒時間（秒）
-        self.cleanup_timer: threading.Timer | None = None
-        self.cleanup_callbacks: list[Callable[..., None]] = []  # 清理回調函數列表
+        self.cleanup_timer: _ScheduledCallback | None = None
+        # 清理回調函數 → 是否為協程函數（註冊時判定一次）
+        self.cleanup_callbacks: dict[Callable[..., Any], bool] = {}
 
         # 新增：清理統計
         self.cleanup_stats: dict[str, Any] = {
             "cleanup_count": 0,
-            "last_cleanup_time": None,
+            "last_cleanup_time_ts": None,  # epoch 秒，讀取統計時才格式化
             "cleanup_reason": None,
             "cleanup_duration": 0.0,
             "memory_freed": 0,
@@ -168,13 +470,28 @@ class WebFeedbackSession:
         # 新增：活躍標籤頁管理
         self.active_tabs: dict[str, Any] = {}
 
+        # 會話更新通知的序列化快取：(快取鍵, JSON 文本)
+        self._update_payload_cache: tuple[tuple, str] | None = None
+        # 會話狀態信息快取：(快取鍵, 狀態字典)
+        self._status_info_cache: tuple[tuple, dict[str, Any]] | None = None
+        # status_update 消息的序列化快取：(狀態字典, JSON 文本)
+        self._status_update_cache: tuple[dict[str, Any], str] | None = None
+        # 最近一次發送的 status_update：(WebSocket, JSON 文本)
+        self._status_update_sent: tuple[Any, str] | None = None
+
+        # 廣播發送佇列，由背景任務統一發送，避免慢客戶端阻塞呼叫方
+        self._send_queue: deque[dict] = deque(maxlen=SEND_QUEUE_MAXSIZE)
+        self._send_ready: asyncio.Event | None = None
+        self._sender_task: asyncio.Task | None = None
+        self._sender_loop: asyncio.AbstractEventLoop | None = None
+
         # 新增：用戶設定的會話超時
         self.user_timeout_enabled = False
         self.user_timeout_seconds = 3600  # 預設 1 小時
-        self.user_timeout_timer: threading.Timer | None = None
+        self.user_timeout_timer: _ScheduledCallback | None = None
 
-        # 確保臨時目錄存在
-        TEMP_DIR.mkdir(parents=True, exist_ok=True)
+        # 確保臨時目錄存在（每個進程只檢查一次）
+        _ensure_temp_dir()
 
         # 獲取資源管理器實例
         self.resource_manager = get_resource_manager()
@@ -202,23 +519,13 @@ class WebFeedbackSession:
         """進入下一個狀態 - 單向流轉，不可倒退"""
         old_status = self.status
 
-        # 定義狀態流轉路徑
-        next_status_map = {
-            SessionStatus.WAITING: SessionStatus.ACTIVE,
-            SessionStatus.ACTIVE: SessionStatus.FEEDBACK_SUBMITTED,
-            SessionStatus.FEEDBACK_SUBMITTED: SessionStatus.COMPLETED,
-            SessionStatus.COMPLETED: None,  # 終態
-            SessionStatus.ERROR: None,  # 終態
-            SessionStatus.TIMEOUT: None,  # 終態
-            SessionStatus.EXPIRED: None,  # 終態
-        }
-
-        next_status = next_status_map.get(self.status)
+        next_status = NEXT_STATUS.get(self.status)
 
         if next_status is None:
-            debug_log(
-                f"⚠️ 會話 {self.session_id} 已處於終態 {self.status.value}，無法進入下一步"
-            )
+            if is_debug_enabled():
+                debug_log(
+                    f"⚠️ 會話 {self.session_id} 已處於終態 {self.status.value}，無法進入下一步"
+                )
             return False
 
         # 執行狀態轉換
@@ -227,12 +534,7 @@ class WebFeedbackSession:
             self.status_message = message
         else:
             # 默認消息
-            default_messages = {
-                SessionStatus.ACTIVE: "會話已啟動",
-                SessionStatus.FEEDBACK_SUBMITTED: "用戶已提交反饋",
-                SessionStatus.COMPLETED: "會話已完成",
-            }
-            self.status_message = default_messages.get(next_status, "狀態已更新")
+            self.status_message = DEFAULT_STATUS_MESSAGES.get(next_status, "狀態已更新")
 
         self.last_activity = time.time()
 
@@ -240,9 +542,10 @@ class WebFeedbackSession:
         if next_status == SessionStatus.FEEDBACK_SUBMITTED:
             self._schedule_auto_cleanup()
 
-        debug_log(
-            f"✅ 會話 {self.session_id} 狀態流轉: {old_status.value} → {next_status.value} - {self.status_message}"
-        )
+        if is_debug_enabled():
+            debug_log(
+                f"✅ 會話 {self.session_id} 狀態流轉: {old_status.value} → {next_status.value} - {self.status_message}"
+            )
         return True
 
     def set_error(self, message: str = "會話發生錯誤") -> bool:
@@ -252,9 +555,10 @@ class WebFeedbackSession:
         self.status_message = message
         self.last_activity = time.time()
 
-        debug_log(
-            f"❌ 會話 {self.session_id} 設置為錯誤狀態: {old_status.value} → {self.status.value} - {message}"
-        )
+        if is_debug_enabled():
+            debug_log(
+                f"❌ 會話 {self.session_id} 設置為錯誤狀態: {old_status.value} → {self.status.value} - {message}"
+            )
         return True
 
     def set_expired(self, message: str = "會話已過期") -> bool:
@@ -264,82 +568,110 @@ class WebFeedbackSession:
         self.status_message = message
         self.last_activity = time.time()
 
-        debug_log(
-            f"⏰ 會話 {self.session_id} 設置為過期狀態: {old_status.value} → {self.status.value} - {message}"
-        )
+        if is_debug_enabled():
+            debug_log(
+                f"⏰ 會話 {self.session_id} 設置為過期狀態: {old_status.value} → {self.status.value} - {message}"
+            )
         return True
 
     def can_proceed(self) -> bool:
         """檢查是否可以進入下一步"""
-        return self.status in [SessionStatus.WAITING, SessionStatus.FEEDBACK_SUBMITTED]
+        return self.status in PROCEEDABLE_STATUSES
 
     def is_terminal(self) -> bool:
         """檢查是否處於終態"""
-        return self.status in [
-            SessionStatus.COMPLETED,
-            SessionStatus.ERROR,
-            SessionStatus.TIMEOUT,
-            SessionStatus.EXPIRED,
-        ]
+        return self.status in TERMINAL_STATUSES
 
     def get_status_info(self) -> dict[str, Any]:
-        """獲取會話狀態信息"""
-        return {
+        """獲取會話狀態信息，狀態未變時返回同一份字典（調用方不應修改）"""
+        cache_key = (
+            self.status,
+            self.status_message,
+            self.feedback_completed.is_set(),
+            self.websocket is not None,
+            self.last_activity,
+            self.summary,
+        )
+        cached = self._status_info_cache
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
+
+        status_info = {
             "status": self.status.value,
             "message": self.status_message,
-            "feedback_completed": self.feedback_completed.is_set(),
-            "has_websocket": self.websocket is not None,
+            "feedback_completed": cache_key[2],
+            "has_websocket": cache_key[3],
             "created_at": self.created_at,
             "last_activity": self.last_activity,
             "project_directory": self.project_directory,
             "summary": self.summary,
             "session_id": self.session_id,
         }
+        self._status_info_cache = (cache_key, status_info)
+        return status_info
+
+    def get_status_update_text(self) -> str:
+        """獲取序列化後的 status_update 消息，狀態未變時直接返回快取"""
+        status_info = self.get_status_info()
+        cached = self._status_update_cache
+        if cached is not None and cached[0] is status_info:
+            return cached[1]
+
+        text = encode_message({"type": "status_update", "status_info": status_info})
+        self._status_update_cache = (status_info, text)
+        return text
+
+    def take_status_update_text(self) -> str | None:
+        """
+        獲取需發送給當前 WebSocket 的 status_update 消息
+
+        與上次發送給同一連接的內容相同時返回 None，調用方無需重複發送。
+        """
+        text = self.get_status_update_text()
+        sent = self._status_update_sent
+        if sent is not None and sent[0] is self.websocket and sent[1] == text:
+            return None
+        self._status_update_sent = (self.websocket, text)
+        return text
 
     def is_active(self) -> bool:
         """檢查會話是否活躍"""
-        return self.status in [
-            SessionStatus.WAITING,
-            SessionStatus.ACTIVE,
-            SessionStatus.FEEDBACK_SUBMITTED,
-        ]
-
-    def is_expired(self) -> bool:
-        """檢查會話是否已過期"""
+        return self.status in ACTIVE_STATUSES
+
+    def is_expired(self, now: float | None = None) -> bool:
+        """檢查會話是否已過期（now 為調用方已取樣的 time.time()，可省略）"""
+        status = self.status
+        # 已過期狀態無需計算時間
+        if status is SessionStatus.EXPIRED:
+            return True
+
         # 統一使用 time.time()
-        current_time = time.time()
+        idle_time = (time.time() if now is None else now) - self.last_activity
 
         # 檢查是否超過最大空閒時間
-        idle_time = current_time - self.last_activity
         if idle_time > self.max_idle_time:
-            debug_log(
-                f"會話 {self.session_id} 空閒時間過長: {idle_time:.1f}秒 > {self.max_idle_time}秒"
-            )
+            if is_debug_enabled():
+                debug_log(
+                    f"會話 {self.session_id} 空閒時間過長: {idle_time:.1f}秒 > {self.max_idle_time}秒"
+                )
             return True
 
-        # 檢查是否處於已過期狀態
-        if self.status == SessionStatus.EXPIRED:
+        # 錯誤或超時狀態超過一定時間視為過期
+        if status in ERROR_EXPIRY_STATUSES and idle_time > ERROR_EXPIRY_SEC:
+            if is_debug_enabled():
+                debug_log(f"會話 {self.session_id} 錯誤狀態時間過長: {idle_time:.1f}秒")
             return True
 
-        # 檢查是否處於錯誤或超時狀態且超過一定時間
-        if self.status in [SessionStatus.ERROR, SessionStatus.TIMEOUT]:
-            error_time = current_time - self.last_activity
-            if error_time > 300:  # 錯誤狀態超過5分鐘視為過期
-                debug_log(
-                    f"會話 {self.session_id} 錯誤狀態時間過長: {error_time:.1f}秒"
-                )
-                return True
-
         return False
 
-    def get_age(self) -> float:
+    def get_age(self, now: float | None = None) -> float:
         """獲取會話年齡（秒）"""
-        current_time = time.time()
+        current_time = time.time() if now is None else now
         return current_time - self.created_at
 
-    def get_idle_time(self) -> float:
+    def get_idle_time(self, now: float | None = None) -> float:
         """獲取會話空閒時間（秒）"""
-        current_time = time.time()
+        current_time = time.time() if now is None else now
         return current_time - self.last_activity
 
     def _schedule_auto_cleanup(self):
@@ -352,16 +684,16 @@ class WebFeedbackSession:
             try:
                 if not self._cleanup_done and self.is_expired():
                     debug_log(f"會話 {self.session_id} 觸發自動清理（過期）")
-                    # 使用異步方式執行清理
-                    import asyncio
-
-                    try:
-                        loop = asyncio.get_event_loop()
-                        loop.create_task(
-                            self._cleanup_resources_enhanced(CleanupReason.EXPIRED)
+                    # 定時回調在工作線程中執行：WebSocket 所在的事件循環仍在運行時，
+                    # 將異步清理提交到該循環，避免跨循環操作連接
+                    loop = self._websocket_loop
+                    if loop is not None and loop.is_running():
+                        asyncio.run_coroutine_threadsafe(
+                            self._cleanup_resources_enhanced(CleanupReason.EXPIRED),
+                            loop,
                         )
-                    except RuntimeError:
-                        # 如果沒有事件循環，使用同步清理
+                    else:
+                        # 沒有可用的事件循環，使用同步清理
                         self._cleanup_sync_enhanced(CleanupReason.EXPIRED)
                 else:
                     # 如果還沒過期，重新安排定時器
@@ -374,9 +706,9 @@ class WebFeedbackSession:
                 )
                 debug_log(f"自動清理失敗 [錯誤ID: {error_id}]: {e}")
 
-        self.cleanup_timer = threading.Timer(self.auto_cleanup_delay, auto_cleanup)
-        self.cleanup_timer.daemon = True
-        self.cleanup_timer.start()
+        self.cleanup_timer = _timer_scheduler.schedule(
+            self.auto_cleanup_delay, auto_cleanup
+        )
         debug_log(
             f"會話 {self.session_id} 自動清理定時器已設置，{self.auto_cleanup_delay}秒後觸發"
         )
@@ -389,42 +721,48 @@ class WebFeedbackSession:
         if self.cleanup_timer:
             self.cleanup_timer.cancel()
 
-        self.cleanup_timer = threading.Timer(additional_time, lambda: None)
-        self.cleanup_timer.daemon = True
-        self.cleanup_timer.start()
+        self.cleanup_timer = _timer_scheduler.schedule(additional_time, lambda: None)
 
         debug_log(f"會話 {self.session_id} 清理定時器已延長 {additional_time} 秒")
 
-    def add_cleanup_callback(self, callback: Callable[..., None]):
+    def add_cleanup_callback(self, callback: Callable[..., Any]):
         """添加清理回調函數"""
         if callback not in self.cleanup_callbacks:
-            self.cleanup_callbacks.append(callback)
+            self.cleanup_callbacks[callback] = inspect.iscoroutinefunction(callback)
             debug_log(f"會話 {self.session_id} 添加清理回調函數")
 
-    def remove_cleanup_callback(self, callback: Callable[..., None]):
+    def remove_cleanup_callback(self, callback: Callable[..., Any]):
         """移除清理回調函數"""
-        if callback in self.cleanup_callbacks:
-            self.cleanup_callbacks.remove(callback)
+        if self.cleanup_callbacks.pop(callback, None) is not None:
             debug_log(f"會話 {self.session_id} 移除清理回調函數")
 
     def get_cleanup_stats(self) -> dict[str, Any]:
         """獲取清理統計信息"""
-        stats = self.cleanup_stats.copy()
-        stats.update(
-            {
-                "session_id": self.session_id,
-                "age": self.get_age(),
-                "idle_time": self.get_idle_time(),
-                "is_expired": self.is_expired(),
-                "is_active": self.is_active(),
-                "status": self.status.value,
-                "has_websocket": self.websocket is not None,
-                "has_process": self.process is not None,
-                "command_logs_count": len(self.command_logs),
-                "images_count": len(self.images),
-            }
-        )
-        return stats
+        now = time.time()
+        cleanup_stats = self.cleanup_stats
+        last_cleanup_ts = cleanup_stats["last_cleanup_time_ts"]
+        return {
+            "cleanup_count": cleanup_stats["cleanup_count"],
+            "last_cleanup_time": (
+                datetime.fromtimestamp(last_cleanup_ts).isoformat()
+                if last_cleanup_ts
+                else None
+            ),
+            "cleanup_reason": cleanup_stats["cleanup_reason"],
+            "cleanup_duration": cleanup_stats["cleanup_duration"],
+            "memory_freed": cleanup_stats["memory_freed"],
+            "resources_cleaned": cleanup_stats["resources_cleaned"],
+            "session_id": self.session_id,
+            "age": self.get_age(now),
+            "idle_time": self.get_idle_time(now),
+            "is_expired": self.is_expired(now),
+            "is_active": self.is_active(),
+            "status": self.status.value,
+            "has_websocket": self.websocket is not None,
+            "has_process": self.process is not None,
+            "command_logs_count": len(self.command_logs),
+            "images_count": len(self.images),
+        }
 
     def update_timeout_settings(self, enabled: bool, timeout_seconds: int = 3600):
         """
@@ -455,8 +793,9 @@ class WebFeedbackSession:
                 # 設置完成事件，讓 wait_for_feedback 結束等待
                 self.feedback_completed.set()
 
-            self.user_timeout_timer = threading.Timer(timeout_seconds, timeout_handler)
-            self.user_timeout_timer.start()
+            self.user_timeout_timer = _timer_scheduler.schedule(
+                timeout_seconds, timeout_handler
+            )
             debug_log(f"已啟動用戶超時計時器: {timeout_seconds}秒")
 
     async def wait_for_feedback(self, timeout: int = 600) -> dict[str, Any]:
@@ -480,12 +819,13 @@ class WebFeedbackSession:
                 f"會話 {self.session_id} 開始等待回饋，超時時間: {actual_timeout} 秒（原始: {timeout} 秒）"
             )
 
-            loop = asyncio.get_event_loop()
-
-            def wait_in_thread():
-                return self.feedback_completed.wait(actual_timeout)
-
-            completed = await loop.run_in_executor(None, wait_in_thread)
+            # 在事件循環中協作式等待，不佔用執行緒池
+            try:
+                completed = await asyncio.wait_for(
+                    self.feedback_completed.wait(), actual_timeout
+                )
+            except TimeoutError:
+                completed = False
 
             if completed:
                 # 檢查是否是用戶設定的超時
@@ -498,7 +838,7 @@ class WebFeedbackSession:
                 return {
                     "logs": "\n".join(self.command_logs),
                     "interactive_feedback": self.feedback_result or "",
-                    "images": self.images,
+                    "images": self.load_images_for_response(),
                     "settings": self.settings,
                 }
             # 超時了，立即清理資源
@@ -506,10 +846,11 @@ class WebFeedbackSession:
                 f"會話 {self.session_id} 在 {actual_timeout} 秒後超時，開始清理資源..."
             )
             await self._cleanup_resources_on_timeout()
-            raise TimeoutError(
-                f"等待用戶回饋超時（{actual_timeout}秒），介面已自動關閉"
-            )
+            raise FeedbackTimeoutError(actual_timeout) from None
 
+        except TimeoutError:
+            # 超時前已完成資源清理，直接向上拋出
+            raise
         except Exception as e:
             # 任何異常都要確保清理資源
             debug_log(f"會話 {self.session_id} 發生異常: {e}")
@@ -533,7 +874,11 @@ class WebFeedbackSession:
         self.feedback_result = feedback
         # 先設置設定，再處理圖片（因為處理圖片時需要用到設定）
         self.settings = settings or {}
-        self.images = self._process_images(images)
+        self._discard_images()
+        # 圖片解碼與寫入臨時文件在工作線程中執行，避免大圖阻塞事件循環
+        self.images = (
+            await asyncio.to_thread(self._process_images, images) if images else []
+        )
 
         # 進入下一步：等待中 → 已提交反饋
         self.next_step("已送出反饋，等待下次 MCP 調用")
@@ -543,13 +888,14 @@ class WebFeedbackSession:
         # 發送反饋已收到的消息給前端
         if self.websocket:
             try:
-                await self.websocket.send_json(
+                await send_message(
+                    self.websocket,
                     {
                         "type": "notification",
                         "code": self.get_message_code("FEEDBACK_SUBMITTED"),
                         "severity": "success",
                         "status": self.status.value,
-                    }
+                    },
                 )
 
                 # 檢查是否為桌面模式，如果是則立即關閉桌面應用程式
@@ -573,6 +919,76 @@ class WebFeedbackSession:
 
         # 重構：不再自動關閉 WebSocket，保持連接以支援頁面持久性
 
+    def attach_websocket(
+        self, websocket: Any, loop: asyncio.AbstractEventLoop | None = None
+    ) -> None:
+        """附加 WebSocket 連接，並記錄其所在的事件循環（預設為當前運行中的循環）"""
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+        self.websocket = websocket
+        self._websocket_loop = loop
+
+    def enqueue_message(self, message: dict[str, Any]) -> None:
+        """將消息放入發送佇列，由背景發送任務送出（需在事件循環中調用）"""
+        loop = asyncio.get_running_loop()
+        if self._sender_task is None or self._sender_task.done():
+            self._send_ready = asyncio.Event()
+            self._sender_loop = loop
+            self._sender_task = loop.create_task(self._run_sender())
+
+        if self._sender_loop is loop:
+            self._push_message(message)
+        elif self._sender_loop is not None:
+            self._sender_loop.call_soon_threadsafe(self._push_message, message)
+
+    def _push_message(self, message: dict[str, Any]) -> None:
+        """推入消息，連續的會話更新通知只保留最新一則"""
+        queue = self._send_queue
+        if (
+            message.get("type") == "session_updated"
+            and queue
+            and queue[-1].get("type") == "session_updated"
+        ):
+            queue[-1] = message
+        else:
+            queue.append(message)
+
+        if self._send_ready is not None:
+            self._send_ready.set()
+
+    async def _run_sender(self) -> None:
+        """背景發送任務：依序將佇列中的消息送到 WebSocket"""
+        assert self._send_ready is not None
+        while True:
+            await self._send_ready.wait()
+            self._send_ready.clear()
+
+            while self._send_queue:
+                message = self._send_queue.popleft()
+                websocket = self.websocket
+                if websocket is None:
+                    self._send_queue.clear()
+                    break
+                try:
+                    await send_message(websocket, message)
+                except Exception as e:
+                    debug_log(f"會話 {self.session_id} 佇列消息發送失敗: {e}")
+
+    def _stop_sender(self) -> None:
+        """停止背景發送任務並清空佇列"""
+        task = self._sender_task
+        if task is not None and not task.done() and self._sender_loop is not None:
+            try:
+                self._sender_loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                # 事件循環已關閉
+                pass
+        self._sender_task = None
+        self._send_queue.clear()
+
     def add_user_message(self, message_data: dict[str, Any]) -> None:
         """添加用戶消息記錄"""
         import time
@@ -587,16 +1003,20 @@ class WebFeedbackSession:
         }
 
         self.user_messages.append(user_message)
-        debug_log(
-            f"會話 {self.session_id} 添加用戶消息，總數: {len(self.user_messages)}"
-        )
+        if is_debug_enabled():
+            debug_log(
+                f"會話 {self.session_id} 添加用戶消息，總數: {len(self.user_messages)}"
+            )
 
     def _process_images(self, images: list[dict]) -> list[dict]:
         """
         處理圖片數據，轉換為統一格式
 
+        處理時會逐項從 images 中取出，傳入的列表將被清空，
+        使每張圖片的 base64 字串在解碼後即可回收，而非保留到處理結束。
+
         Args:
-            images: 原始圖片數據列表
+            images: 原始圖片數據列表（處理後為空）
 
         Returns:
             List[dict]: 處理後的圖片數據
@@ -606,43 +1026,75 @@ class WebFeedbackSession:
         # 從設定中獲取圖片大小限制，如果沒有設定則使用預設值
         size_limit = self.settings.get("image_size_limit", MAX_IMAGE_SIZE)
 
-        for img in images:
+        # 反轉後從尾部彈出，保持原順序且每次彈出為 O(1)
+        images.reverse()
+        while images:
+            img = images.pop()
             try:
-                if not all(key in img for key in ["name", "data", "size"]):
+                if not img.keys() >= REQUIRED_IMAGE_KEYS:
+                    continue
+                name = img["name"]
+                data = img["data"]
+
+                # 前端提供 MIME 類型時，跳過不支援的格式
+                mime_type = img.get("type")
+                if mime_type and mime_type not in SUPPORTED_IMAGE_TYPES:
+                    debug_log(f"圖片 {name} 類型 {mime_type} 不受支援，跳過")
                     continue
 
                 # 檢查文件大小（只有當限制大於0時才檢查）
                 if size_limit > 0 and img["size"] > size_limit:
-                    debug_log(
-                        f"圖片 {img['name']} 超過大小限制 ({size_limit} bytes)，跳過"
-                    )
+                    debug_log(f"圖片 {name} 超過大小限制 ({size_limit} bytes)，跳過")
                     continue
 
-                # 解碼 base64 數據
-                if isinstance(img["data"], str):
+                # 解碼 base64 數據（去除可能存在的 data URL 前綴）
+                if isinstance(data, str):
+                    payload = data
+                    if payload.startswith("data:"):
+                        payload = payload.partition(",")[2]
+
+                    # 由 base64 長度推算解碼後大小，超過限制時不分配解碼緩衝區
+                    if size_limit > 0:
+                        padding = payload[-2:].count("=")
+                        decoded_size = (len(payload) * 3 >> 2) - padding
+                        if decoded_size > size_limit:
+                            debug_log(
+                                f"圖片 {name} 解碼後約 {decoded_size} bytes，"
+                                f"超過大小限制 ({size_limit} bytes)，跳過"
+                            )
+                            continue
+
+                    # a2b_base64 直接接受 ASCII 字串，無需先複製為 bytes
                     try:
-                        image_bytes = base64.b64decode(img["data"])
-                    except Exception as e:
-                        debug_log(f"圖片 {img['name']} base64 解碼失敗: {e}")
+                        image_bytes = binascii.a2b_base64(payload)
+                    except ValueError as e:
+                        debug_log(f"圖片 {name} base64 解碼失敗: {e}")
                         continue
                 else:
-                    image_bytes = img["data"]
+                    image_bytes = data
 
                 if len(image_bytes) == 0:
-                    debug_log(f"圖片 {img['name']} 數據為空，跳過")
+                    debug_log(f"圖片 {name} 數據為空，跳過")
                     continue
 
+                # 圖片數據寫入臨時文件，會話只保留路徑，回應 MCP 時再讀取
+                image_path = create_temp_file(
+                    suffix=Path(name).suffix,
+                    prefix="image_",
+                    dir=str(TEMP_DIR),
+                    text=False,
+                )
+                Path(image_path).write_bytes(image_bytes)
+
                 processed_images.append(
                     {
-                        "name": img["name"],
-                        "data": image_bytes,  # 保存原始 bytes 數據
+                        "name": name,
+                        "path": image_path,
                         "size": len(image_bytes),
                     }
                 )
 
-                debug_log(
-                    f"圖片 {img['name']} 處理成功，大小: {len(image_bytes)} bytes"
-                )
+                debug_log(f"圖片 {name} 處理成功，大小: {len(image_bytes)} bytes")
 
             except Exception as e:
                 debug_log(f"圖片處理錯誤: {e}")
@@ -650,23 +1102,92 @@ class WebFeedbackSession:
 
         return processed_images
 
+    def load_images_for_response(self) -> list[dict]:
+        """
+        從臨時文件讀取圖片數據，供 MCP 回應使用
+
+        Returns:
+            List[dict]: 包含 name、data（bytes）和 size 的圖片列表
+        """
+        loaded_images = []
+        for img in self.images:
+            try:
+                image_bytes = Path(img["path"]).read_bytes()
+            except OSError as e:
+                debug_log(f"讀取圖片 {img['name']} 失敗: {e}")
+                continue
+            loaded_images.append(
+                {"name": img["name"], "data": image_bytes, "size": img["size"]}
+            )
+        return loaded_images
+
+    def _discard_images(self) -> int:
+        """刪除圖片臨時文件並清空圖片列表，返回清理的圖片數量"""
+        images_count = len(self.images)
+        for img in self.images:
+            try:
+                Path(img["path"]).unlink(missing_ok=True)
+            except OSError as e:
+                debug_log(f"刪除圖片臨時文件失敗: {e}")
+            self.resource_manager.unregister_temp_file(img["path"])
+        self.images.clear()
+        return images_count
+
     def add_log(self, log_entry: str):
         """添加命令日誌"""
         self.command_logs.append(log_entry)
 
-    async def run_command(self, command: str):
-        """執行命令並透過 WebSocket 發送輸出（安全版本）"""
-        if self.process:
-            # 終止現有進程
-            try:
-                self.process.terminate()
-                self.process.wait(timeout=5)
-            except:
+    def _terminate_process(self, timeout: float = COMMAND_TERMINATE_TIMEOUT) -> bool:
+        """
+        終止命令進程（不阻塞，可從任意線程調用）
+
+        進程屬於啟動它的事件循環，終止操作會轉交到該事件循環執行；
+        若進程在 timeout 秒內仍未結束則強制 kill。
+
+        Returns:
+            bool: 是否有進程需要終止
+        """
+        process, loop = self.process, self._process_loop
+        self.process = None
+        if process is None or loop is None:
+            return False
+
+        def kill_if_running():
+            if process.returncode is None:
                 try:
-                    self.process.kill()
-                except:
+                    process.kill()
+                    debug_log(f"會話 {self.session_id} 命令進程已強制終止")
+                except ProcessLookupError:
                     pass
-            self.process = None
+
+        def terminate():
+            if process.returncode is not None:
+                return
+            try:
+                process.terminate()
+            except ProcessLookupError:
+                return
+            loop.call_later(timeout, kill_if_running)
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        try:
+            if running_loop is loop:
+                terminate()
+            else:
+                loop.call_soon_threadsafe(terminate)
+        except RuntimeError:
+            # 所屬事件循環已關閉，進程交由資源管理器處理
+            debug_log(f"會話 {self.session_id} 命令進程的事件循環已關閉")
+        return True
+
+    async def run_command(self, command: str):
+        """執行命令並透過 WebSocket 發送輸出（安全版本）"""
+        # 終止現有進程
+        self._terminate_process()
 
         try:
             debug_log(f"執行命令: {command}")
@@ -678,73 +1199,119 @@ class WebFeedbackSession:
                 error_msg = f"命令安全檢查失敗: {e}"
                 debug_log(error_msg)
                 if self.websocket:
-                    await self.websocket.send_json(
-                        {"type": "command_error", "error": error_msg}
+                    await send_message(
+                        self.websocket, {"type": "command_error", "error": error_msg}
                     )
                 return
 
-            # 使用安全的方式執行命令（不使用 shell=True）
-            self.process = subprocess.Popen(
-                parsed_command,
-                shell=False,  # 安全：不使用 shell
+            # 使用安全的方式執行命令（不經過 shell），輸出由事件循環直接讀取
+            process = await asyncio.create_subprocess_exec(
+                *parsed_command,
                 cwd=self.project_directory,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                limit=COMMAND_OUTPUT_LINE_LIMIT,
             )
+            self.process = process
+            self._process_loop = asyncio.get_running_loop()
+            encoding = locale.getpreferredencoding(False)
 
             # 註冊進程到資源管理器
             register_process(
-                self.process,
+                process.pid,
                 description=f"WebFeedbackSession-{self.session_id}-command",
                 auto_cleanup=True,
             )
 
-            # 在背景線程中讀取輸出
+            # 命令輸出緩衝：讀取與發送分離，多行輸出合併為單一幀發送
+            output_buffer: deque[str] = deque()
+            buffer_size = 0
+            output_ready = asyncio.Event()
+            reading_done = False
+
+            async def flush_output():
+                nonlocal buffer_size
+                send_failed = False
+                while True:
+                    await output_ready.wait()
+                    # 短暫等待以收集更多輸出行，緩衝已滿或讀取結束時立即發送
+                    if not reading_done and buffer_size < COMMAND_OUTPUT_BATCH_SIZE:
+                        await asyncio.sleep(COMMAND_OUTPUT_FLUSH_DELAY)
+                    output_ready.clear()
+
+                    while output_buffer:
+                        chunk: list[str] = []
+                        chunk_size = 0
+                        while output_buffer and (
+                            not chunk
+                            or chunk_size + len(output_buffer[0])
+                            <= COMMAND_OUTPUT_MAX_FRAME
+                        ):
+                            line = output_buffer.popleft()
+                            chunk.append(line)
+                            chunk_size += len(line)
+                        buffer_size -= chunk_size
+
+                        if self.websocket and not send_failed:
+                            try:
+                                await send_message(
+                                    self.websocket,
+                                    {
+                                        "type": "command_output",
+                                        "output": "".join(chunk),
+                                    },
+                                )
+                            except Exception as e:
+                                debug_log(f"WebSocket 發送失敗: {e}")
+                                send_failed = True
+
+                    if reading_done:
+                        return
+
+            # 讀取輸出
             async def read_output():
-                loop = asyncio.get_event_loop()
+                nonlocal buffer_size, reading_done
+                flush_task = asyncio.create_task(flush_output())
                 try:
-                    # 使用線程池執行器來處理阻塞的讀取操作
-                    def read_line():
-                        if self.process and self.process.stdout:
-                            return self.process.stdout.readline()
-                        return ""
-
+                    assert process.stdout is not None
                     while True:
-                        line = await loop.run_in_executor(None, read_line)
-                        if not line:
+                        raw_line = await process.stdout.readline()
+                        if not raw_line:
                             break
 
+                        line = raw_line.decode(encoding, errors="replace").replace(
+                            "\r\n", "\n"
+                        )
                         self.add_log(line.rstrip())
-                        if self.websocket:
-                            try:
-                                await self.websocket.send_json(
-                                    {"type": "command_output", "output": line}
-                                )
-                            except Exception as e:
-                                debug_log(f"WebSocket 發送失敗: {e}")
-                                break
+                        output_buffer.append(line)
+                        buffer_size += len(line)
+                        output_ready.set()
 
                 except Exception as e:
                     debug_log(f"讀取命令輸出錯誤: {e}")
                 finally:
-                    # 等待進程完成
-                    if self.process:
-                        exit_code = self.process.wait()
+                    # 發送剩餘輸出，確保完成信號在所有輸出之後
+                    reading_done = True
+                    output_ready.set()
+                    await flush_task
 
-                        # 從資源管理器取消註冊進程
-                        self.resource_manager.unregister_process(self.process.pid)
-
-                        # 發送命令完成信號
-                        if self.websocket:
-                            try:
-                                await self.websocket.send_json(
-                                    {"type": "command_complete", "exit_code": exit_code}
-                                )
-                            except Exception as e:
-                                debug_log(f"發送完成信號失敗: {e}")
+                    # 等待進程完成
+                    exit_code = await process.wait()
+                    if self.process is process:
+                        self.process = None
+
+                    # 從資源管理器取消註冊進程
+                    self.resource_manager.unregister_process(process.pid)
+
+                    # 發送命令完成信號
+                    if self.websocket:
+                        try:
+                            await send_message(
+                                self.websocket,
+                                {"type": "command_complete", "exit_code": exit_code},
+                            )
+                        except Exception as e:
+                            debug_log(f"發送完成信號失敗: {e}")
 
             # 啟動異步任務讀取輸出
             asyncio.create_task(read_output())
@@ -753,43 +1320,44 @@ class WebFeedbackSession:
             debug_log(f"執行命令錯誤: {e}")
             if self.websocket:
                 try:
-                    await self.websocket.send_json(
-                        {"type": "command_error", "error": str(e)}
+                    await send_message(
+                        self.websocket, {"type": "command_error", "error": str(e)}
                     )
-                except:
+                except (RuntimeError, OSError, WebSocketDisconnect):
                     pass
 
+    def _claim_cleanup(self) -> bool:
+        """原子地標記會話已清理，僅首個調用者返回 True"""
+        with self._cleanup_lock:
+            if self._cleanup_done:
+                return False
+            self._cleanup_done = True
+            return True
+
     async def _cleanup_resources_on_timeout(self):
         """超時時清理所有資源（保持向後兼容）"""
         await self._cleanup_resources_enhanced(CleanupReason.TIMEOUT)
 
     async def _cleanup_resources_enhanced(self, reason: CleanupReason):
         """增強的資源清理方法"""
-        if self._cleanup_done:
+        if not self._claim_cleanup():
             return  # 避免重複清理
 
         cleanup_start_time = time.time()
-        self._cleanup_done = True
 
         debug_log(f"開始清理會話 {self.session_id} 的資源，原因: {reason.value}")
 
         # 更新清理統計
         self.cleanup_stats["cleanup_count"] += 1
         self.cleanup_stats["cleanup_reason"] = reason.value
-        self.cleanup_stats["last_cleanup_time"] = datetime.now().isoformat()
+        self.cleanup_stats["last_cleanup_time_ts"] = cleanup_start_time
 
         resources_cleaned = 0
         memory_before = 0
 
         try:
             # 記錄清理前的內存使用（如果可能）
-            try:
-                import psutil
-
-                process = psutil.Process()
-                memory_before = process.memory_info().rss
-            except:
-                pass
+            memory_before = _current_process_rss()
 
             # 1. 取消自動清理定時器
             if self.cleanup_timer:
@@ -803,30 +1371,30 @@ class WebFeedbackSession:
                 self.user_timeout_timer = None
                 resources_cleaned += 1
 
+            # 1.6. 停止廣播發送任務
+            self._stop_sender()
+
             # 2. 關閉 WebSocket 連接
             if self.websocket:
                 try:
-                    # 根據清理原因獲取訊息代碼
-                    code_key_map = {
-                        CleanupReason.TIMEOUT: "TIMEOUT_CLEANUP",
-                        CleanupReason.EXPIRED: "EXPIRED_CLEANUP",
-                        CleanupReason.MEMORY_PRESSURE: "MEMORY_PRESSURE_CLEANUP",
-                        CleanupReason.MANUAL: "MANUAL_CLEANUP",
-                        CleanupReason.ERROR: "ERROR_CLEANUP",
-                        CleanupReason.SHUTDOWN: "SHUTDOWN_CLEANUP",
-                    }
-
-                    code_key = code_key_map.get(reason, "SESSION_CLEANUP")
-
-                    await self.websocket.send_json(
-                        {
-                            "type": "notification",
-                            "code": self.get_message_code(code_key),
-                            "severity": "warning",
-                            "reason": reason.value,
-                        }
-                    )
-                    await asyncio.sleep(0.1)  # 給前端一點時間處理消息
+                    # 客戶端已斷開時跳過通知與等待，直接嘗試關閉
+                    if (
+                        getattr(self.websocket, "client_state", None)
+                        == WebSocketState.CONNECTED
+                    ):
+                        # 根據清理原因獲取訊息代碼
+                        code_key = CLEANUP_MESSAGE_KEYS.get(reason, "SESSION_CLEANUP")
+
+                        await send_message(
+                            self.websocket,
+                            {
+                                "type": "notification",
+                                "code": self.get_message_code(code_key),
+                                "severity": "warning",
+                                "reason": reason.value,
+                            },
+                        )
+                        await asyncio.sleep(0.1)  # 給前端一點時間處理消息
 
                     # 安全關閉 WebSocket
                     await self._safe_close_websocket()
@@ -838,30 +1406,21 @@ class WebFeedbackSession:
                     self.websocket = None
 
             # 3. 終止正在運行的命令進程
-            if self.process:
-                try:
-                    self.process.terminate()
-                    try:
-                        self.process.wait(timeout=3)
-                        debug_log(f"會話 {self.session_id} 命令進程已正常終止")
-                    except subprocess.TimeoutExpired:
-                        self.process.kill()
-                        debug_log(f"會話 {self.session_id} 命令進程已強制終止")
+            try:
+                if self._terminate_process(timeout=3):
+                    debug_log(f"會話 {self.session_id} 命令進程已發送終止信號")
                     resources_cleaned += 1
-                except Exception as e:
-                    debug_log(f"終止命令進程時發生錯誤: {e}")
-                finally:
-                    self.process = None
+            except Exception as e:
+                debug_log(f"終止命令進程時發生錯誤: {e}")
 
             # 4. 設置完成事件（防止其他地方還在等待）
             self.feedback_completed.set()
 
             # 5. 清理臨時數據
             logs_count = len(self.command_logs)
-            images_count = len(self.images)
+            images_count = self._discard_images()
 
             self.command_logs.clear()
-            self.images.clear()
             self.settings.clear()
 
             if logs_count > 0 or images_count > 0:
@@ -869,35 +1428,27 @@ class WebFeedbackSession:
                 debug_log(f"清理了 {logs_count} 條日誌和 {images_count} 張圖片")
 
             # 6. 更新會話狀態
-            if reason == CleanupReason.EXPIRED:
-                self.status = SessionStatus.EXPIRED
-            elif reason == CleanupReason.TIMEOUT:
-                self.status = SessionStatus.TIMEOUT
-            elif reason == CleanupReason.ERROR:
-                self.status = SessionStatus.ERROR
-            else:
-                self.status = SessionStatus.COMPLETED
+            self.status = CLEANUP_FINAL_STATUS.get(reason, SessionStatus.COMPLETED)
 
-            # 7. 調用清理回調函數
-            for callback in self.cleanup_callbacks:
+            # 7. 調用清理回調函數：同步回調依序執行，異步回調並行等待
+            async_callbacks = []
+            for callback, is_async in self.cleanup_callbacks.items():
+                if is_async:
+                    async_callbacks.append(callback(self, reason))
+                    continue
                 try:
-                    if asyncio.iscoroutinefunction(callback):
-                        await callback(self, reason)
-                    else:
-                        callback(self, reason)
+                    callback(self, reason)
                 except Exception as e:
                     debug_log(f"清理回調執行失敗: {e}")
+            if async_callbacks:
+                results = await asyncio.gather(*async_callbacks, return_exceptions=True)
+                for result in results:
+                    if isinstance(result, Exception):
+                        debug_log(f"清理回調執行失敗: {result}")
 
             # 8. 計算清理效果
             cleanup_duration = time.time() - cleanup_start_time
-            memory_after = 0
-            try:
-                import psutil
-
-                process = psutil.Process()
-                memory_after = process.memory_info().rss
-            except:
-                pass
+            memory_after = _current_process_rss()
 
             memory_freed = max(0, memory_before - memory_after)
 
@@ -940,7 +1491,7 @@ class WebFeedbackSession:
         self, reason: CleanupReason, preserve_websocket: bool = False
     ):
         """增強的同步清理會話資源"""
-        if self._cleanup_done and not preserve_websocket:
+        if not preserve_websocket and not self._claim_cleanup():
             return
 
         cleanup_start_time = time.time()
@@ -951,20 +1502,14 @@ class WebFeedbackSession:
         # 更新清理統計
         self.cleanup_stats["cleanup_count"] += 1
         self.cleanup_stats["cleanup_reason"] = reason.value
-        self.cleanup_stats["last_cleanup_time"] = datetime.now().isoformat()
+        self.cleanup_stats["last_cleanup_time_ts"] = cleanup_start_time
 
         resources_cleaned = 0
         memory_before = 0
 
         try:
             # 記錄清理前的內存使用
-            try:
-                import psutil
-
-                process = psutil.Process()
-                memory_before = process.memory_info().rss
-            except:
-                pass
+            memory_before = _current_process_rss()
 
             # 1. 取消自動清理定時器
             if self.cleanup_timer:
@@ -973,68 +1518,44 @@ class WebFeedbackSession:
                 resources_cleaned += 1
 
             # 2. 清理進程
-            if self.process:
-                try:
-                    self.process.terminate()
-                    self.process.wait(timeout=5)
-                    debug_log(f"會話 {self.session_id} 命令進程已正常終止")
+            try:
+                if self._terminate_process():
+                    debug_log(f"會話 {self.session_id} 命令進程已發送終止信號")
                     resources_cleaned += 1
-                except:
-                    try:
-                        self.process.kill()
-                        debug_log(f"會話 {self.session_id} 命令進程已強制終止")
-                        resources_cleaned += 1
-                    except:
-                        pass
-                self.process = None
+            except Exception as e:
+                debug_log(f"終止命令進程時發生錯誤: {e}")
 
             # 3. 清理臨時數據
             logs_count = len(self.command_logs)
-            images_count = len(self.images)
 
             self.command_logs.clear()
             if not preserve_websocket:
-                self.images.clear()
+                resources_cleaned += self._discard_images()
                 self.settings.clear()
-                resources_cleaned += images_count
 
             resources_cleaned += logs_count
 
-            # 4. 設置完成事件
+            # 4. 設置完成事件並停止廣播發送任務
             if not preserve_websocket:
                 self.feedback_completed.set()
+                self._stop_sender()
 
             # 5. 更新狀態
             if not preserve_websocket:
-                if reason == CleanupReason.EXPIRED:
-                    self.status = SessionStatus.EXPIRED
-                elif reason == CleanupReason.TIMEOUT:
-                    self.status = SessionStatus.TIMEOUT
-                elif reason == CleanupReason.ERROR:
-                    self.status = SessionStatus.ERROR
-                else:
-                    self.status = SessionStatus.COMPLETED
-
-                self._cleanup_done = True
+                self.status = CLEANUP_FINAL_STATUS.get(reason, SessionStatus.COMPLETED)
 
             # 6. 調用清理回調函數（同步版本）
-            for callback in self.cleanup_callbacks:
+            for callback, is_async in self.cleanup_callbacks.items():
+                if is_async:
+                    continue
                 try:
-                    if not asyncio.iscoroutinefunction(callback):
-                        callback(self, reason)
+                    callback(self, reason)
                 except Exception as e:
                     debug_log(f"同步清理回調執行失敗: {e}")
 
             # 7. 計算清理效果
             cleanup_duration = time.time() - cleanup_start_time
-            memory_after = 0
-            try:
-                import psutil
-
-                process = psutil.Process()
-                memory_after = process.memory_info().rss
-            except:
-                pass
+            memory_after = _current_process_rss()
 
             memory_freed = max(0, memory_before - memory_after)
 
@@ -1082,8 +1603,8 @@ class WebFeedbackSession:
         try:
             # 檢查連接狀態
             if (
-                hasattr(self.websocket, "client_state")
-                and self.websocket.client_state.DISCONNECTED
+                getattr(self.websocket, "client_state", None)
+                == WebSocketState.DISCONNECTED
             ):
                 debug_log("WebSocket 已斷開，跳過關閉操作")
                 return
@@ -6,45 +6,288 @@
 設置 Web UI 的主要路由和處理邏輯。
 """
 
-import json
+import asyncio
+import atexit
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
 import time
+from collections.abc import Awaitable, Callable
+from functools import lru_cache
 from pathlib import Path
-from typing import TYPE_CHECKING
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
 
-from fastapi import Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, JSONResponse
+import orjson
+from fastapi import Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse
 
 from ... import __version__
+from ...debug import is_debug_enabled
 from ...debug import web_debug_log as debug_log
 from ..constants import get_message_code as get_msg_code
+from ..utils.json_response import ORJSONResponse
+from ..utils.ws_messages import (
+    decode_binary_message,
+    encode_static_message,
+    is_binary_message,
+    is_heartbeat_frame,
+    send_message,
+)
 
 
 if TYPE_CHECKING:
     from ..main import WebUIManager
 
 
+# Web 翻譯檔案目錄與支援的語言
+WEB_LOCALES_DIR = Path(__file__).parent.parent / "locales"
+SUPPORTED_WEB_LANGUAGES = ("zh-TW", "zh-CN", "en")
+
+# 統一的設定檔案路徑，於載入模組時解析一次
+CONFIG_DIR = Path.home() / ".config" / "mcp-feedback-enhanced"
+UI_SETTINGS_FILE = CONFIG_DIR / "ui_settings.json"
+SESSION_HISTORY_FILE = CONFIG_DIR / "session_history.json"
+
+# 設定寫入的防抖延遲（秒），期間內的多次保存只寫入最後一次
+SETTINGS_WRITE_DELAY = 0.5
+
+# Windows 上目標檔案被開啟或映射時 os.replace 會拋出 PermissionError，短暫重試
+JSON_REPLACE_RETRIES = 5
+JSON_REPLACE_RETRY_DELAY = 0.05
+
+# 回饋頁面模板中固定不變的上下文
+FEEDBACK_PAGE_CONTEXT = MappingProxyType(
+    {
+        "title": "Interactive Feedback - 回饋收集",
+        "version": __version__,
+        "has_session": True,
+    }
+)
+
+
+def _write_json_atomic(path: Path, data: Any) -> None:
+    """
+    以 orjson 序列化並原子地寫入 JSON 檔案
+
+    先寫入同目錄的臨時檔案再以 os.replace 替換，避免寫入中斷時留下不完整的檔案。
+    Windows 上目標檔案正被讀取（開啟或映射）時替換會拋出 PermissionError，
+    此時短暫等待後重試，多次失敗才向上拋出。
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps(data))
+        for attempt in range(JSON_REPLACE_RETRIES):
+            try:
+                os.replace(temp_path, path)
+                break
+            except PermissionError:
+                if attempt == JSON_REPLACE_RETRIES - 1:
+                    raise
+                debug_log(f"替換 {path.name} 被拒絕，檔案可能正被讀取，稍後重試")
+                time.sleep(JSON_REPLACE_RETRY_DELAY)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def _read_json_mmap(path: Path) -> Any:
+    """
+    以記憶體映射讀取並解析 JSON 檔案
+
+    orjson 直接從映射解析，省去將整個檔案讀入用戶空間緩衝區的複製。
+    POSIX 上檔案以 os.replace 原子替換，映射期間舊檔案內容不會被改寫；
+    Windows 上映射中的檔案無法被替換，寫入方會收到 PermissionError
+    並由 _write_json_atomic 重試。
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # 空檔案無法映射，交由 orjson 拋出解析錯誤
+            return orjson.loads(b"")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+class _SettingsStore:
+    """
+    UI 設定檔案的進程內快取
+
+    以檔案的 (st_mtime_ns, st_size) 作為快取鍵，檔案未變更時只需一次 stat。
+    保存時先記錄於記憶體，延遲 SETTINGS_WRITE_DELAY 秒後再寫入檔案。
+    返回的字典為共享快取，調用方需修改時應先複製。
+    """
+
+    def __init__(self) -> None:
+        # _lock 只保護記憶體狀態，持有期間不做檔案 I/O，save() 因此不會阻塞
+        self._lock = threading.Lock()
+        # 串行化檔案寫入與刪除
+        self._io_lock = threading.Lock()
+        self._key: tuple[Path, int, int] | None = None
+        self._cached: dict[str, Any] = {}
+        self._pending: dict[str, Any] | None = None
+        self._flush_timer: threading.Timer | None = None
+
+    @property
+    def settings_file(self) -> Path:
+        """統一的設定檔案路徑"""
+        return UI_SETTINGS_FILE
+
+    def get(self) -> dict[str, Any]:
+        """讀取設定，檔案不存在時返回空字典，解析失敗時拋出異常"""
+        with self._lock:
+            if self._pending is not None:
+                return self._pending
+            cached_key, cached = self._key, self._cached
+
+        settings_file = self.settings_file
+        try:
+            st = settings_file.stat()
+        except FileNotFoundError:
+            return {}
+
+        key = (settings_file, st.st_mtime_ns, st.st_size)
+        if key == cached_key:
+            return cached
+
+        settings: dict[str, Any] = orjson.loads(settings_file.read_bytes())
+        with self._lock:
+            self._cached = settings
+            self._key = key
+        return settings
+
+    def save(self, settings: dict[str, Any]) -> Path:
+        """記錄最新設定並排程延遲寫入，不做檔案 I/O，可直接在事件循環中調用"""
+        with self._lock:
+            self._pending = settings
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(SETTINGS_WRITE_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        return self.settings_file
+
+    def flush(self) -> None:
+        """立即原子寫入待保存的設定，並以寫入的內容更新快取，下次讀取無需重新解析"""
+        with self._io_lock:
+            with self._lock:
+                self._cancel_flush()
+                settings = self._pending
+            if settings is None:
+                return
+
+            settings_file = self.settings_file
+            try:
+                _write_json_atomic(settings_file, settings)
+                st = settings_file.stat()
+            except Exception as e:
+                # 寫入失敗時保留記憶體中的設定，下次保存或退出時重試
+                debug_log(f"寫入設定檔案失敗: {e}")
+                return
+
+            with self._lock:
+                self._cached = settings
+                self._key = (settings_file, st.st_mtime_ns, st.st_size)
+                # 寫入期間若有新的保存，保留新設定等待下次寫入
+                if self._pending is settings:
+                    self._pending = None
+
+    def _cancel_flush(self) -> None:
+        """取消已排程的延遲寫入（須持有鎖）"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    def delete(self) -> bool:
+        """刪除設定檔案並清空快取，返回檔案原本是否存在"""
+        with self._io_lock:
+            with self._lock:
+                self._cancel_flush()
+                self._pending = None
+                self._key = None
+                self._cached = {}
+            try:
+                self.settings_file.unlink()
+            except FileNotFoundError:
+                return False
+            return True
+
+
+_settings_store = _SettingsStore()
+# 進程退出前寫入尚未落盤的設定
+atexit.register(_settings_store.flush)
+
+
 def load_user_layout_settings() -> str:
     """載入用戶的佈局模式設定"""
     try:
-        # 使用統一的設定檔案路徑
-        config_dir = Path.home() / ".config" / "mcp-feedback-enhanced"
-        settings_file = config_dir / "ui_settings.json"
-
-        if settings_file.exists():
-            with open(settings_file, encoding="utf-8") as f:
-                settings = json.load(f)
-                layout_mode = settings.get("layoutMode", "combined-vertical")
-                debug_log(f"從設定檔案載入佈局模式: {layout_mode}")
-                # 修復 no-any-return 錯誤 - 確保返回 str 類型
-                return str(layout_mode)
-        else:
-            debug_log("設定檔案不存在，使用預設佈局模式: combined-vertical")
-            return "combined-vertical"
+        settings = _settings_store.get()
+        if settings:
+            layout_mode = settings.get("layoutMode", "combined-vertical")
+            debug_log(f"從設定檔案載入佈局模式: {layout_mode}")
+            # 修復 no-any-return 錯誤 - 確保返回 str 類型
+            return str(layout_mode)
+        debug_log("設定檔案不存在，使用預設佈局模式: combined-vertical")
+        return "combined-vertical"
     except Exception as e:
         debug_log(f"載入佈局設定失敗: {e}，使用預設佈局模式: combined-vertical")
         return "combined-vertical"
 
 
+def _translation_file(lang_code: str) -> Path:
+    """取得指定語言的 Web 翻譯檔案路徑"""
+    return WEB_LOCALES_DIR / lang_code / "translation.json"
+
+
+def _translation_mtimes() -> tuple[int | None, ...]:
+    """取得各翻譯檔案的修改時間（檔案不存在時為 None）"""
+    mtimes: list[int | None] = []
+    for lang_code in SUPPORTED_WEB_LANGUAGES:
+        try:
+            mtimes.append(_translation_file(lang_code).stat().st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+@lru_cache(maxsize=1)
+def _build_translations_payload(
+    mtimes: tuple[int | None, ...],
+) -> tuple[bytes, str]:
+    """載入所有翻譯檔案並序列化，以檔案修改時間為快取鍵，返回 (JSON, ETag)"""
+    translations: dict[str, Any] = {}
+
+    for lang_code, mtime in zip(SUPPORTED_WEB_LANGUAGES, mtimes, strict=True):
+        translation_file = _translation_file(lang_code)
+
+        if mtime is None:
+            debug_log(f"Web 翻譯檔案不存在: {translation_file}")
+            translations[lang_code] = {}
+            continue
+
+        try:
+            translations[lang_code] = orjson.loads(translation_file.read_bytes())
+            debug_log(f"成功載入 Web 翻譯: {lang_code}")
+        except Exception as e:
+            debug_log(f"載入 Web 翻譯檔案失敗 {lang_code}: {e}")
+            translations[lang_code] = {}
+
+    debug_log(f"Web 翻譯 API 返回 {len(translations)} 種語言的數據")
+    payload: bytes = orjson.dumps(translations)
+    etag = f'"{hashlib.md5(payload, usedforsecurity=False).hexdigest()}"'
+    return payload, etag
+
+
+def get_translations_payload() -> tuple[bytes, str]:
+    """獲取序列化後的翻譯數據及其 ETag，翻譯檔案未變更時直接返回快取"""
+    return _build_translations_payload(_translation_mtimes())
+
+
 # 使用統一的訊息代碼系統
 # 從 ..constants 導入的 get_msg_code 函數會處理所有訊息代碼
 # 舊的 key 會自動映射到新的常量
@@ -53,6 +296,29 @@ def load_user_layout_settings() -> str:
 def setup_routes(manager: "WebUIManager"):
     """設置路由"""
 
+    @lru_cache(maxsize=1)
+    def render_waiting_page() -> str:
+        """渲染等待頁面，內容固定，首次渲染後直接返回快取"""
+        html: str = manager.templates.get_template("index.html").render(
+            title="MCP Feedback Enhanced",
+            has_session=False,
+            version=__version__,
+        )
+        return html
+
+    @lru_cache(maxsize=32)
+    def render_feedback_page(
+        project_directory: str, summary: str, layout_mode: str
+    ) -> str:
+        """渲染回饋頁面，以全部模板輸入為快取鍵，同一會話重複載入時直接返回快取"""
+        html: str = manager.templates.get_template("feedback.html").render(
+            **FEEDBACK_PAGE_CONTEXT,
+            project_directory=project_directory,
+            summary=summary,
+            layout_mode=layout_mode,
+        )
+        return html
+
     @manager.app.get("/", response_class=HTMLResponse)
     async def index(request: Request):
         """統一回饋頁面 - 重構後的主頁面"""
@@ -61,61 +327,27 @@ def setup_routes(manager: "WebUIManager"):
 
         if not current_session:
             # 沒有活躍會話時顯示等待頁面
-            return manager.templates.TemplateResponse(
-                "index.html",
-                {
-                    "request": request,
-                    "title": "MCP Feedback Enhanced",
-                    "has_session": False,
-                    "version": __version__,
-                },
-            )
+            return HTMLResponse(render_waiting_page())
 
         # 有活躍會話時顯示回饋頁面
         # 載入用戶的佈局模式設定
-        layout_mode = load_user_layout_settings()
+        layout_mode = await asyncio.to_thread(load_user_layout_settings)
 
-        return manager.templates.TemplateResponse(
-            "feedback.html",
-            {
-                "request": request,
-                "project_directory": current_session.project_directory,
-                "summary": current_session.summary,
-                "title": "Interactive Feedback - 回饋收集",
-                "version": __version__,
-                "has_session": True,
-                "layout_mode": layout_mode,
-            },
+        return HTMLResponse(
+            render_feedback_page(
+                current_session.project_directory, current_session.summary, layout_mode
+            )
         )
 
     @manager.app.get("/api/translations")
-    async def get_translations():
+    async def get_translations(request: Request):
         """獲取翻譯數據 - 從 Web 專用翻譯檔案載入"""
-        translations = {}
-
-        # 獲取 Web 翻譯檔案目錄
-        web_locales_dir = Path(__file__).parent.parent / "locales"
-        supported_languages = ["zh-TW", "zh-CN", "en"]
-
-        for lang_code in supported_languages:
-            lang_dir = web_locales_dir / lang_code
-            translation_file = lang_dir / "translation.json"
-
-            try:
-                if translation_file.exists():
-                    with open(translation_file, encoding="utf-8") as f:
-                        lang_data = json.load(f)
-                        translations[lang_code] = lang_data
-                        debug_log(f"成功載入 Web 翻譯: {lang_code}")
-                else:
-                    debug_log(f"Web 翻譯檔案不存在: {translation_file}")
-                    translations[lang_code] = {}
-            except Exception as e:
-                debug_log(f"載入 Web 翻譯檔案失敗 {lang_code}: {e}")
-                translations[lang_code] = {}
-
-        debug_log(f"Web 翻譯 API 返回 {len(translations)} 種語言的數據")
-        return JSONResponse(content=translations)
+        payload, etag = await asyncio.to_thread(get_translations_payload)
+        headers = {"ETag": etag}
+        # 翻譯未變更時讓瀏覽器沿用已快取的內容
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=payload, media_type="application/json", headers=headers)
 
     @manager.app.get("/api/session-status")
     async def get_session_status(request: Request):
@@ -130,7 +362,7 @@ def setup_routes(manager: "WebUIManager"):
             lang = "zh-TW"
 
         if not current_session:
-            return JSONResponse(
+            return ORJSONResponse(
                 content={
                     "has_session": False,
                     "status": "no_session",
@@ -138,7 +370,7 @@ def setup_routes(manager: "WebUIManager"):
                 }
             )
 
-        return JSONResponse(
+        return ORJSONResponse(
             content={
                 "has_session": True,
                 "status": "active",
@@ -158,7 +390,7 @@ def setup_routes(manager: "WebUIManager"):
         # 從查詢參數獲取語言，如果沒有則從會話獲取，最後使用默認值
 
         if not current_session:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=404,
                 content={
                     "error": "No active session",
@@ -166,13 +398,13 @@ def setup_routes(manager: "WebUIManager"):
                 },
             )
 
-        return JSONResponse(
+        return ORJSONResponse(
             content={
                 "session_id": current_session.session_id,
                 "project_directory": current_session.project_directory,
                 "summary": current_session.summary,
                 "feedback_completed": current_session.feedback_completed.is_set(),
-                "command_logs": current_session.command_logs,
+                "command_logs": list(current_session.command_logs),
                 "images_count": len(current_session.images),
             }
         )
@@ -204,12 +436,14 @@ def setup_routes(manager: "WebUIManager"):
             # 按創建時間排序（最新的在前）
             sessions_data.sort(key=lambda x: x["created_at"], reverse=True)
 
-            debug_log(f"返回 {len(sessions_data)} 個會話的實時狀態")
-            return JSONResponse(content={"sessions": sessions_data})
+            # 前端定期輪詢此接口，未啟用調試時省去格式化字串
+            if is_debug_enabled():
+                debug_log(f"返回 {len(sessions_data)} 個會話的實時狀態")
+            return ORJSONResponse(content={"sessions": sessions_data})
 
         except Exception as e:
             debug_log(f"獲取所有會話狀態失敗: {e}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={
                     "error": f"Failed to get sessions: {e!s}",
@@ -222,11 +456,11 @@ def setup_routes(manager: "WebUIManager"):
         """添加用戶消息到當前會話"""
 
         try:
-            data = await request.json()
+            data = orjson.loads(await request.body())
             current_session = manager.get_current_session()
 
             if not current_session:
-                return JSONResponse(
+                return ORJSONResponse(
                     status_code=404,
                     content={
                         "error": "No active session",
@@ -238,7 +472,7 @@ def setup_routes(manager: "WebUIManager"):
             current_session.add_user_message(data)
 
             debug_log(f"用戶消息已添加到會話 {current_session.session_id}")
-            return JSONResponse(
+            return ORJSONResponse(
                 content={
                     "status": "success",
                     "messageCode": get_msg_code("user_message_recorded"),
@@ -247,7 +481,7 @@ def setup_routes(manager: "WebUIManager"):
 
         except Exception as e:
             debug_log(f"添加用戶消息失敗: {e}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={
                     "error": f"Failed to add user message: {e!s}",
@@ -267,46 +501,36 @@ def setup_routes(manager: "WebUIManager"):
         await websocket.accept()
 
         # 語言由前端處理，不需要在後端設置
-        debug_log(f"WebSocket 連接建立，語言由前端處理: {lang}")
+        debug_enabled = is_debug_enabled()
+        if debug_enabled:
+            debug_log(f"WebSocket 連接建立，語言由前端處理: {lang}")
 
         # 檢查會話是否已有 WebSocket 連接
         if session.websocket and session.websocket != websocket:
             debug_log("會話已有 WebSocket 連接，替換為新連接")
 
-        session.websocket = websocket
-        debug_log(f"WebSocket 連接建立: 當前活躍會話 {session.session_id}")
+        session.attach_websocket(websocket)
+        if debug_enabled:
+            debug_log(f"WebSocket 連接建立: 當前活躍會話 {session.session_id}")
 
         # 發送連接成功消息
         try:
-            await websocket.send_json(
-                {
-                    "type": "connection_established",
-                    "messageCode": get_msg_code("websocket_connected"),
-                }
+            await websocket.send_text(
+                encode_static_message(
+                    type="connection_established",
+                    messageCode=get_msg_code("websocket_connected"),
+                )
             )
 
             # 檢查是否有待發送的會話更新
-            if getattr(manager, "_pending_session_update", False):
+            if manager._pending_session_update:
                 debug_log("檢測到待發送的會話更新，準備發送通知")
-                await websocket.send_json(
-                    {
-                        "type": "session_updated",
-                        "action": "new_session_created",
-                        "messageCode": get_msg_code("new_session_created"),
-                        "session_info": {
-                            "project_directory": session.project_directory,
-                            "summary": session.summary,
-                            "session_id": session.session_id,
-                        },
-                    }
-                )
+                await websocket.send_text(manager.get_session_update_payload(session))
                 manager._pending_session_update = False
                 debug_log("✅ 已發送會話更新通知到前端")
-            else:
+            elif status_text := session.take_status_update_text():
                 # 發送當前會話狀態
-                await websocket.send_json(
-                    {"type": "status_update", "status_info": session.get_status_info()}
-                )
+                await websocket.send_text(status_text)
                 debug_log("已發送當前會話狀態到前端")
 
         except Exception as e:
@@ -314,17 +538,32 @@ def setup_routes(manager: "WebUIManager"):
 
         try:
             while True:
-                data = await websocket.receive_text()
-                message = json.loads(data)
+                # 同時接受文字幀與二進位幀，orjson 可直接解析 str 或 bytes
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
 
                 # 重新獲取當前會話，以防會話已切換
                 current_session = manager.get_current_session()
-                if current_session and current_session.websocket == websocket:
-                    await handle_websocket_message(manager, current_session, message)
-                else:
+                if not current_session or current_session.websocket != websocket:
                     debug_log("會話已切換或 WebSocket 連接不匹配，忽略消息")
                     break
 
+                data = frame.get("bytes")
+                if data is None:
+                    message = orjson.loads(frame["text"])
+                elif is_heartbeat_frame(data):
+                    # 二進位心跳無需解析，直接處理
+                    await _handle_binary_heartbeat(current_session, data)
+                    continue
+                elif is_binary_message(data):
+                    # 附帶圖片原始字節的回饋提交
+                    message = decode_binary_message(data)
+                else:
+                    message = orjson.loads(data)
+
+                await handle_websocket_message(manager, current_session, message)
+
         except WebSocketDisconnect:
             debug_log("WebSocket 連接正常斷開")
         except ConnectionResetError:
@@ -343,20 +582,14 @@ def setup_routes(manager: "WebUIManager"):
         """保存設定到檔案"""
 
         try:
-            data = await request.json()
-
-            # 使用統一的設定檔案路徑
-            config_dir = Path.home() / ".config" / "mcp-feedback-enhanced"
-            config_dir.mkdir(parents=True, exist_ok=True)
-            settings_file = config_dir / "ui_settings.json"
+            data = orjson.loads(await request.body())
 
-            # 保存設定到檔案
-            with open(settings_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # 記錄設定，檔案由背景延遲寫入
+            settings_file = _settings_store.save(data)
 
             debug_log(f"設定已保存到: {settings_file}")
 
-            return JSONResponse(
+            return ORJSONResponse(
                 content={
                     "status": "success",
                     "messageCode": get_msg_code("settings_saved"),
@@ -365,7 +598,7 @@ def setup_routes(manager: "WebUIManager"):
 
         except Exception as e:
             debug_log(f"保存設定失敗: {e}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={
                     "status": "error",
@@ -379,22 +612,17 @@ def setup_routes(manager: "WebUIManager"):
         """從檔案載入設定"""
 
         try:
-            # 使用統一的設定檔案路徑
-            config_dir = Path.home() / ".config" / "mcp-feedback-enhanced"
-            settings_file = config_dir / "ui_settings.json"
+            settings = await asyncio.to_thread(_settings_store.get)
 
-            if settings_file.exists():
-                with open(settings_file, encoding="utf-8") as f:
-                    settings = json.load(f)
-
-                debug_log(f"設定已從檔案載入: {settings_file}")
-                return JSONResponse(content=settings)
+            if settings:
+                debug_log(f"設定已從檔案載入: {_settings_store.settings_file}")
+                return ORJSONResponse(content=settings)
             debug_log("設定檔案不存在，返回空設定")
-            return JSONResponse(content={})
+            return ORJSONResponse(content={})
 
         except Exception as e:
             debug_log(f"載入設定失敗: {e}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={
                     "status": "error",
@@ -408,17 +636,12 @@ def setup_routes(manager: "WebUIManager"):
         """清除設定檔案"""
 
         try:
-            # 使用統一的設定檔案路徑
-            config_dir = Path.home() / ".config" / "mcp-feedback-enhanced"
-            settings_file = config_dir / "ui_settings.json"
-
-            if settings_file.exists():
-                settings_file.unlink()
-                debug_log(f"設定檔案已刪除: {settings_file}")
+            if await asyncio.to_thread(_settings_store.delete):
+                debug_log(f"設定檔案已刪除: {_settings_store.settings_file}")
             else:
                 debug_log("設定檔案不存在，無需刪除")
 
-            return JSONResponse(
+            return ORJSONResponse(
                 content={
                     "status": "success",
                     "messageCode": get_msg_code("settings_cleared"),
@@ -427,7 +650,7 @@ def setup_routes(manager: "WebUIManager"):
 
         except Exception as e:
             debug_log(f"清除設定失敗: {e}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={
                     "status": "error",
@@ -441,13 +664,10 @@ def setup_routes(manager: "WebUIManager"):
         """從檔案載入會話歷史"""
 
         try:
-            # 使用統一的設定檔案路徑
-            config_dir = Path.home() / ".config" / "mcp-feedback-enhanced"
-            history_file = config_dir / "session_history.json"
+            history_file = SESSION_HISTORY_FILE
 
-            if history_file.exists():
-                with open(history_file, encoding="utf-8") as f:
-                    history_data = json.load(f)
+            if await asyncio.to_thread(history_file.exists):
+                history_data = await asyncio.to_thread(_read_json_mmap, history_file)
 
                 debug_log(f"會話歷史已從檔案載入: {history_file}")
 
@@ -462,16 +682,16 @@ def setup_routes(manager: "WebUIManager"):
                     last_cleanup = 0
 
                 # 回傳會話歷史資料
-                return JSONResponse(
+                return ORJSONResponse(
                     content={"sessions": sessions, "lastCleanup": last_cleanup}
                 )
 
             debug_log("會話歷史檔案不存在，返回空歷史")
-            return JSONResponse(content={"sessions": [], "lastCleanup": 0})
+            return ORJSONResponse(content={"sessions": [], "lastCleanup": 0})
 
         except Exception as e:
             debug_log(f"載入會話歷史失敗: {e}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={
                     "status": "error",
@@ -485,12 +705,9 @@ def setup_routes(manager: "WebUIManager"):
         """保存會話歷史到檔案"""
 
         try:
-            data = await request.json()
+            data = orjson.loads(await request.body())
 
-            # 使用統一的設定檔案路徑
-            config_dir = Path.home() / ".config" / "mcp-feedback-enhanced"
-            config_dir.mkdir(parents=True, exist_ok=True)
-            history_file = config_dir / "session_history.json"
+            history_file = SESSION_HISTORY_FILE
 
             # 建立新格式的資料結構
             history_data = {
@@ -501,14 +718,13 @@ def setup_routes(manager: "WebUIManager"):
             }
 
             # 保存會話歷史到檔案
-            with open(history_file, "w", encoding="utf-8") as f:
-                json.dump(history_data, f, ensure_ascii=False, indent=2)
+            await asyncio.to_thread(_write_json_atomic, history_file, history_data)
 
             debug_log(f"會話歷史已保存到: {history_file}")
             session_count = len(history_data["sessions"])
             debug_log(f"保存了 {session_count} 個會話記錄")
 
-            return JSONResponse(
+            return ORJSONResponse(
                 content={
                     "status": "success",
                     "messageCode": get_msg_code("session_history_saved"),
@@ -518,7 +734,7 @@ def setup_routes(manager: "WebUIManager"):
 
         except Exception as e:
             debug_log(f"保存會話歷史失敗: {e}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={
                     "status": "error",
@@ -532,25 +748,20 @@ def setup_routes(manager: "WebUIManager"):
         """獲取日誌等級設定"""
 
         try:
-            # 使用統一的設定檔案路徑
-            config_dir = Path.home() / ".config" / "mcp-feedback-enhanced"
-            settings_file = config_dir / "ui_settings.json"
-
-            if settings_file.exists():
-                with open(settings_file, encoding="utf-8") as f:
-                    settings_data = json.load(f)
-                    log_level = settings_data.get("logLevel", "INFO")
-                    debug_log(f"從設定檔案載入日誌等級: {log_level}")
-                    return JSONResponse(content={"logLevel": log_level})
-            else:
-                # 預設日誌等級
-                default_log_level = "INFO"
-                debug_log(f"使用預設日誌等級: {default_log_level}")
-                return JSONResponse(content={"logLevel": default_log_level})
+            settings_data = await asyncio.to_thread(_settings_store.get)
+
+            if settings_data:
+                log_level = settings_data.get("logLevel", "INFO")
+                debug_log(f"從設定檔案載入日誌等級: {log_level}")
+                return ORJSONResponse(content={"logLevel": log_level})
+            # 預設日誌等級
+            default_log_level = "INFO"
+            debug_log(f"使用預設日誌等級: {default_log_level}")
+            return ORJSONResponse(content={"logLevel": default_log_level})
 
         except Exception as e:
             debug_log(f"獲取日誌等級失敗: {e}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={
                     "error": f"Failed to get log level: {e!s}",
@@ -563,11 +774,11 @@ def setup_routes(manager: "WebUIManager"):
         """設定日誌等級"""
 
         try:
-            data = await request.json()
+            data = orjson.loads(await request.body())
             log_level = data.get("logLevel")
 
             if not log_level or log_level not in ["DEBUG", "INFO", "WARN", "ERROR"]:
-                return JSONResponse(
+                return ORJSONResponse(
                     status_code=400,
                     content={
                         "error": "Invalid log level",
@@ -575,27 +786,18 @@ def setup_routes(manager: "WebUIManager"):
                     },
                 )
 
-            # 使用統一的設定檔案路徑
-            config_dir = Path.home() / ".config" / "mcp-feedback-enhanced"
-            config_dir.mkdir(parents=True, exist_ok=True)
-            settings_file = config_dir / "ui_settings.json"
-
-            # 載入現有設定或創建新設定
-            settings_data = {}
-            if settings_file.exists():
-                with open(settings_file, encoding="utf-8") as f:
-                    settings_data = json.load(f)
+            # 載入現有設定或創建新設定（複製快取，避免修改共享字典）
+            settings_data = dict(await asyncio.to_thread(_settings_store.get))
 
             # 更新日誌等級
             settings_data["logLevel"] = log_level
 
-            # 保存設定到檔案
-            with open(settings_file, "w", encoding="utf-8") as f:
-                json.dump(settings_data, f, ensure_ascii=False, indent=2)
+            # 記錄設定，檔案由背景延遲寫入
+            _settings_store.save(settings_data)
 
             debug_log(f"日誌等級已設定為: {log_level}")
 
-            return JSONResponse(
+            return ORJSONResponse(
                 content={
                     "status": "success",
                     "logLevel": log_level,
@@ -605,7 +807,7 @@ def setup_routes(manager: "WebUIManager"):
 
         except Exception as e:
             debug_log(f"設定日誌等級失敗: {e}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={
                     "status": "error",
@@ -615,76 +817,114 @@ def setup_routes(manager: "WebUIManager"):
             )
 
 
-async def handle_websocket_message(manager: "WebUIManager", session, data: dict):
-    """處理 WebSocket 消息"""
-    message_type = data.get("type")
+async def _handle_submit_feedback(manager: "WebUIManager", session, data: dict):
+    """提交回饋"""
+    feedback = data.get("feedback", "")
+    images = data.get("images", [])
+    settings = data.get("settings", {})
+    await session.submit_feedback(feedback, images, settings)
 
-    if message_type == "submit_feedback":
-        # 提交回饋
-        feedback = data.get("feedback", "")
-        images = data.get("images", [])
-        settings = data.get("settings", {})
-        await session.submit_feedback(feedback, images, settings)
-
-    elif message_type == "run_command":
-        # 執行命令
-        command = data.get("command", "")
-        if command.strip():
-            await session.run_command(command)
-
-    elif message_type == "get_status":
-        # 獲取會話狀態
-        if session.websocket:
-            try:
-                await session.websocket.send_json(
-                    {"type": "status_update", "status_info": session.get_status_info()}
-                )
-            except Exception as e:
-                debug_log(f"發送狀態更新失敗: {e}")
 
-    elif message_type == "heartbeat":
-        # WebSocket 心跳處理（簡化版）
-        # 更新心跳時間
-        session.last_heartbeat = time.time()
-        session.last_activity = time.time()
+async def _handle_run_command(manager: "WebUIManager", session, data: dict):
+    """執行命令"""
+    command = data.get("command", "")
+    if command.strip():
+        await session.run_command(command)
 
-        # 發送心跳回應
-        if session.websocket:
-            try:
-                await session.websocket.send_json(
-                    {
-                        "type": "heartbeat_response",
-                        "timestamp": data.get("timestamp", 0),
-                    }
-                )
-            except Exception as e:
-                debug_log(f"發送心跳回應失敗: {e}")
 
-    elif message_type == "user_timeout":
-        # 用戶設置的超時已到
-        debug_log(f"收到用戶超時通知: {session.session_id}")
-        # 清理會話資源
-        await session._cleanup_resources_on_timeout()
-        # 重構：不再自動停止服務器，保持服務器運行以支援持久性
+async def _handle_get_status(manager: "WebUIManager", session, data: dict):
+    """獲取會話狀態，客戶端已收到相同狀態時不重複發送"""
+    if session.websocket and (status_text := session.take_status_update_text()):
+        try:
+            await session.websocket.send_text(status_text)
+        except Exception as e:
+            debug_log(f"發送狀態更新失敗: {e}")
+
 
-    elif message_type == "pong":
-        # 處理來自前端的 pong 回應（用於連接檢測）
-        debug_log(f"收到 pong 回應，時間戳: {data.get('timestamp', 'N/A')}")
-        # 可以在這裡記錄延遲或更新連接狀態
-
-    elif message_type == "update_timeout_settings":
-        # 處理超時設定更新
-        settings = data.get("settings", {})
-        debug_log(f"收到超時設定更新: {settings}")
-        if settings.get("enabled"):
-            session.update_timeout_settings(
-                enabled=True, timeout_seconds=settings.get("seconds", 3600)
+async def _handle_heartbeat(manager: "WebUIManager", session, data: dict):
+    """WebSocket 心跳處理（簡化版）"""
+    # 更新心跳時間
+    session.last_heartbeat = session.last_activity = time.time()
+
+    # 發送心跳回應
+    if session.websocket:
+        try:
+            await send_message(
+                session.websocket,
+                {
+                    "type": "heartbeat_response",
+                    "timestamp": data.get("timestamp", 0),
+                },
             )
-        else:
-            session.update_timeout_settings(enabled=False)
+        except Exception as e:
+            debug_log(f"發送心跳回應失敗: {e}")
+
+
+async def _handle_binary_heartbeat(session, frame: bytes):
+    """二進位心跳處理：心跳幀即為回應內容，原樣回傳"""
+    session.last_heartbeat = session.last_activity = time.time()
+
+    if session.websocket:
+        try:
+            await session.websocket.send_bytes(frame)
+        except Exception as e:
+            debug_log(f"發送心跳回應失敗: {e}")
+
+
+async def _handle_user_timeout(manager: "WebUIManager", session, data: dict):
+    """用戶設置的超時已到"""
+    debug_log(f"收到用戶超時通知: {session.session_id}")
+    # 清理會話資源
+    await session._cleanup_resources_on_timeout()
+    # 重構：不再自動停止服務器，保持服務器運行以支援持久性
 
+
+async def _handle_pong(manager: "WebUIManager", session, data: dict):
+    """處理來自前端的 pong 回應（用於連接檢測）"""
+    if is_debug_enabled():
+        debug_log(f"收到 pong 回應，時間戳: {data.get('timestamp', 'N/A')}")
+    # 可以在這裡記錄延遲或更新連接狀態
+
+
+async def _handle_update_timeout_settings(manager: "WebUIManager", session, data: dict):
+    """處理超時設定更新"""
+    settings = data.get("settings", {})
+    debug_log(f"收到超時設定更新: {settings}")
+    if settings.get("enabled"):
+        session.update_timeout_settings(
+            enabled=True, timeout_seconds=settings.get("seconds", 3600)
+        )
     else:
+        session.update_timeout_settings(enabled=False)
+
+
+# WebSocket 消息類型與處理函數的對應表
+WEBSOCKET_MESSAGE_HANDLERS: dict[
+    str, Callable[["WebUIManager", Any, dict], Awaitable[None]]
+] = {
+    "heartbeat": _handle_heartbeat,
+    "get_status": _handle_get_status,
+    "submit_feedback": _handle_submit_feedback,
+    "run_command": _handle_run_command,
+    "user_timeout": _handle_user_timeout,
+    "pong": _handle_pong,
+    "update_timeout_settings": _handle_update_timeout_settings,
+}
+
+
+async def handle_websocket_message(manager: "WebUIManager", session, data: dict):
+    """處理 WebSocket 消息"""
+    message_type = data.get("type")
+    # 非字串的類型（可能不可雜湊）一律視為未知消息
+    handler = (
+        WEBSOCKET_MESSAGE_HANDLERS.get(message_type)
+        if isinstance(message_type, str)
+        else None
+    )
+    if handler is None:
         debug_log(f"未知的消息類型: {message_type}")
+        return
+    await handler(manager, session, data)
 
 
 async def _delayed_server_stop(manager: "WebUIManager"):
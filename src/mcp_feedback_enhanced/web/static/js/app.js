@@ -1205,8 +1205,8 @@
                 this.webSocketManager.stopSessionTimeout();
             }
 
-            // 3. 發送回饋到 AI 助手
-            const success = this.webSocketManager.send({
+            // 3. 發送回饋到 AI 助手（圖片以二進位幀傳送原始位元組）
+            const success = this.webSocketManager.sendWithImages({
                 type: 'submit_feedback',
                 feedback: feedbackData.feedback,
                 images: feedbackData.images,
@@ -12,6 +12,10 @@
     window.MCPFeedback = window.MCPFeedback || {};
     const Utils = window.MCPFeedback.Utils;
 
+    // 二進位心跳幀：[1 字節類型標記][8 字節大端序 float64 時間戳]，伺服器原樣回傳
+    const HEARTBEAT_FRAME_TAG = 0x01;
+    const HEARTBEAT_FRAME_SIZE = 9;
+
     /**
      * WebSocket 管理器建構函數
      */
@@ -87,6 +91,7 @@
             const language = window.i18nManager ? window.i18nManager.getCurrentLanguage() : 'zh-TW';
             const wsUrlWithLang = wsUrl + (wsUrl.includes('?') ? '&' : '?') + 'lang=' + language;
             this.websocket = new WebSocket(wsUrlWithLang);
+            this.websocket.binaryType = 'arraybuffer';
             this.setupWebSocketEvents();
 
         } catch (error) {
@@ -154,6 +159,11 @@
      * 處理訊息接收
      */
     WebSocketManager.prototype.handleMessage = function(event) {
+        if (event.data instanceof ArrayBuffer) {
+            this.handleBinaryMessage(event.data);
+            return;
+        }
+
         try {
             const data = Utils.safeJsonParse(event.data, null);
             if (data) {
@@ -174,6 +184,24 @@
         }
     };
 
+    /**
+     * 處理二進位訊息（目前僅有心跳回應）
+     */
+    WebSocketManager.prototype.handleBinaryMessage = function(buffer) {
+        if (buffer.byteLength !== HEARTBEAT_FRAME_SIZE ||
+            new DataView(buffer).getUint8(0) !== HEARTBEAT_FRAME_TAG) {
+            console.warn('未知的二進位 WebSocket 訊息');
+            return;
+        }
+
+        this.handleHeartbeatResponse();
+        // 記錄訊息與 pong 時間到監控器
+        if (this.connectionMonitor) {
+            this.connectionMonitor.recordMessage();
+            this.connectionMonitor.recordPong();
+        }
+    };
+
     /**
      * 處理連接關閉
      */
@@ -350,6 +378,70 @@
         }
     };
 
+    /**
+     * 將 base64 字串（可含 data URL 前綴）解碼為位元組
+     */
+    function base64ToBytes(base64) {
+        const commaIndex = base64.indexOf(',');
+        if (base64.startsWith('data:') && commaIndex !== -1) {
+            base64 = base64.substring(commaIndex + 1);
+        }
+        const binary = atob(base64);
+        const bytes = new Uint8Array(binary.length);
+        for (let i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return bytes;
+    }
+
+    /**
+     * 發送附帶圖片的訊息
+     * 圖片以原始位元組放在二進位幀中，避免 base64 膨脹：
+     * [4 字節大端序標頭長度][JSON 標頭][圖片 1 位元組][圖片 2 位元組]...
+     */
+    WebSocketManager.prototype.sendWithImages = function(data) {
+        const images = data.images || [];
+        if (images.length === 0) {
+            return this.send(data);
+        }
+        if (!this.websocket || this.websocket.readyState !== WebSocket.OPEN) {
+            console.warn('WebSocket 未連接，無法發送訊息');
+            return false;
+        }
+
+        try {
+            const imageBytes = images.map(function(img) {
+                return base64ToBytes(img.data);
+            });
+            const header = Object.assign({}, data, {
+                images: images.map(function(img, index) {
+                    return { name: img.name, type: img.type, size: imageBytes[index].length };
+                })
+            });
+            const headerBytes = new TextEncoder().encode(JSON.stringify(header));
+
+            let totalSize = 4 + headerBytes.length;
+            imageBytes.forEach(function(bytes) {
+                totalSize += bytes.length;
+            });
+
+            const frame = new Uint8Array(totalSize);
+            new DataView(frame.buffer).setUint32(0, headerBytes.length);
+            frame.set(headerBytes, 4);
+            let offset = 4 + headerBytes.length;
+            imageBytes.forEach(function(bytes) {
+                frame.set(bytes, offset);
+                offset += bytes.length;
+            });
+
+            this.websocket.send(frame.buffer);
+            return true;
+        } catch (error) {
+            console.error('發送 WebSocket 訊息失敗:', error);
+            return false;
+        }
+    };
+
     /**
      * 請求會話狀態
      */
@@ -373,17 +465,27 @@
                     self.connectionMonitor.recordPing();
                 }
 
-                self.send({
-                    type: 'heartbeat',
-                    tabId: self.tabManager ? self.tabManager.getTabId() : null,
-                    timestamp: Date.now()
-                });
+                self.sendHeartbeat();
             }
         }, this.heartbeatFrequency);
 
         console.log('💓 WebSocket 心跳已啟動，頻率: ' + this.heartbeatFrequency + 'ms');
     };
 
+    /**
+     * 以固定長度的二進位幀發送心跳，省去 JSON 序列化與解析
+     */
+    WebSocketManager.prototype.sendHeartbeat = function() {
+        const frame = new DataView(new ArrayBuffer(HEARTBEAT_FRAME_SIZE));
+        frame.setUint8(0, HEARTBEAT_FRAME_TAG);
+        frame.setFloat64(1, Date.now());
+        try {
+            this.websocket.send(frame.buffer);
+        } catch (error) {
+            console.error('發送心跳失敗:', error);
+        }
+    };
+
     /**
      * 停止心跳
      */
@@ -8,17 +8,20 @@
 
 import os
 import subprocess
-import webbrowser
 from collections.abc import Callable
+from functools import cache
 
 # 導入調試功能
 from ...debug import server_debug_log as debug_log
 
 
+@cache
 def is_wsl_environment() -> bool:
     """
     檢測是否在 WSL 環境中運行
 
+    運行環境在進程生命週期內不會改變，檢測結果首次計算後即快取。
+
     Returns:
         bool: True 表示 WSL 環境，False 表示其他環境
     """
@@ -139,6 +142,9 @@ def smart_browser_open(url: str) -> None:
         open_browser_in_wsl(url)
     else:
         debug_log("使用標準瀏覽器啟動方式")
+        # 延遲導入：僅在實際開啟瀏覽器時才載入 webbrowser
+        import webbrowser
+
         webbrowser.open(url)
 
 
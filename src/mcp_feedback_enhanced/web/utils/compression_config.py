@@ -8,10 +8,16 @@
 """
 
 import os
+from collections.abc import Iterator
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Any
 
 
+# 路徑分類結果的快取容量
+PATH_CACHE_SIZE = 1024
+
+
 @dataclass
 class CompressionConfig:
     """壓縮配置類"""
@@ -85,24 +91,30 @@ class CompressionConfig:
                 return True
         return False
 
-    def get_cache_headers(self, path: str) -> dict[str, str]:
-        """獲取緩存頭"""
-        headers = {}
-
+    def get_cache_policy(self, path: str) -> tuple[tuple[tuple[str, str], ...], int]:
+        """獲取路徑的固定緩存頭與 Expires 有效期（秒，0 表示不需動態 Expires）"""
         if path.startswith("/static/"):
             # 靜態文件緩存
-            headers["Cache-Control"] = f"public, max-age={self.static_cache_max_age}"
-            headers["Expires"] = self._get_expires_header(self.static_cache_max_age)
+            max_age = self.static_cache_max_age
         elif path.startswith("/api/") and self.api_cache_max_age > 0:
             # API 緩存（如果啟用）
-            headers["Cache-Control"] = f"public, max-age={self.api_cache_max_age}"
-            headers["Expires"] = self._get_expires_header(self.api_cache_max_age)
+            max_age = self.api_cache_max_age
         else:
             # 其他路徑不緩存
-            headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-            headers["Pragma"] = "no-cache"
-            headers["Expires"] = "0"
+            return (
+                ("Cache-Control", "no-cache, no-store, must-revalidate"),
+                ("Pragma", "no-cache"),
+                ("Expires", "0"),
+            ), 0
+
+        return (("Cache-Control", f"public, max-age={max_age}"),), max_age
 
+    def get_cache_headers(self, path: str) -> dict[str, str]:
+        """獲取緩存頭"""
+        fixed_headers, max_age = self.get_cache_policy(path)
+        headers = dict(fixed_headers)
+        if max_age > 0:
+            headers["Expires"] = self._get_expires_header(max_age)
         return headers
 
     def _get_expires_header(self, max_age: int) -> str:
@@ -138,6 +150,25 @@ class CompressionManager:
             "compression_ratio": 0.0,
         }
 
+        # 路徑分類只取決於路徑與配置，以 LRU 快取避免每個請求重複計算
+        self._should_exclude_path = lru_cache(maxsize=PATH_CACHE_SIZE)(
+            self.config.should_exclude_path
+        )
+        self._get_cache_policy = lru_cache(maxsize=PATH_CACHE_SIZE)(
+            self.config.get_cache_policy
+        )
+
+    def should_exclude_path(self, path: str) -> bool:
+        """判斷路徑是否應該排除（快取版本）"""
+        return self._should_exclude_path(path)
+
+    def iter_cache_headers(self, path: str) -> Iterator[tuple[str, str]]:
+        """逐一產生路徑的緩存頭（快取路徑分類，Expires 每次動態計算）"""
+        fixed_headers, max_age = self._get_cache_policy(path)
+        yield from fixed_headers
+        if max_age > 0:
+            yield "Expires", self.config._get_expires_header(max_age)
+
     def update_stats(
         self, original_size: int, compressed_size: int, was_compressed: bool
     ):
@@ -157,6 +188,28 @@ class CompressionManager:
                 1 - self._stats["bytes_compressed"] / self._stats["bytes_original"]
             ) * 100
 
+    def update_stats_batch(
+        self,
+        requests: int,
+        compressed_requests: int,
+        bytes_original: int,
+        bytes_sent: int,
+    ):
+        """批量更新壓縮統計
+
+        bytes_original 為 GZip 之前的響應大小，bytes_sent 為實際送出的大小
+        （未壓縮的響應兩者相同）。
+        """
+        self._stats["requests_total"] += requests
+        self._stats["requests_compressed"] += compressed_requests
+        self._stats["bytes_original"] += bytes_original
+        self._stats["bytes_compressed"] += bytes_sent
+
+        if self._stats["bytes_original"] > 0:
+            self._stats["compression_ratio"] = (
+                1 - self._stats["bytes_compressed"] / self._stats["bytes_original"]
+            ) * 100
+
     def get_stats(self) -> dict[str, Any]:
         """獲取壓縮統計"""
         stats = self._stats.copy()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+JSON 響應工具
+=============
+
+以 orjson 序列化 HTTP JSON 響應。FastAPI 內建的 ORJSONResponse 已被棄用，
+因此在此提供等效的實作。
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """使用 orjson 序列化內容的 JSON 響應"""
+
+    def render(self, content: Any) -> bytes:
+        body: bytes = orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return body
@@ -8,6 +8,8 @@
 
 import socket
 
+from .port_manager import PortManager
+
 
 def find_free_port(
     start_port: int = 8765, max_attempts: int = 100, preferred_port: int = 8765
@@ -27,20 +29,20 @@ def find_free_port(
         RuntimeError: 如果找不到可用端口
     """
     # 首先嘗試偏好端口（通常是 8765）
-    if is_port_available("127.0.0.1", preferred_port):
+    if PortManager.is_port_available("127.0.0.1", preferred_port, strict=True):
         return preferred_port
 
-    # 如果偏好端口不可用，嘗試其他端口
-    for i in range(max_attempts):
-        port = start_port + i
-        if port == preferred_port:  # 跳過已經嘗試過的偏好端口
-            continue
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+    # 如果偏好端口不可用，嘗試其他端口（綁定失敗的 socket 可重複使用）
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        for i in range(max_attempts):
+            port = start_port + i
+            if port == preferred_port:  # 跳過已經嘗試過的偏好端口
+                continue
+            try:
                 sock.bind(("127.0.0.1", port))
                 return port
-        except OSError:
-            continue
+            except OSError:
+                continue
 
     raise RuntimeError(
         f"無法在 {start_port}-{start_port + max_attempts - 1} 範圍內找到可用端口"
@@ -49,7 +51,7 @@ def find_free_port(
 
 def is_port_available(host: str, port: int) -> bool:
     """
-    檢查端口是否可用
+    檢查端口是否可用（以綁定方式檢查）
 
     Args:
         host: 主機地址
@@ -58,9 +60,4 @@ def is_port_available(host: str, port: int) -> bool:
     Returns:
         bool: 端口是否可用
     """
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.bind((host, port))
-            return True
-    except OSError:
-        return False
+    return PortManager.is_port_available(host, port, strict=True)
@@ -16,6 +16,13 @@ import psutil
 from ...debug import debug_log
 
 
+# 端口探測的連接超時（秒），本機連接被拒絕時會立即返回
+PORT_PROBE_TIMEOUT = 0.2
+
+# 萬用地址無法作為連接目標，探測時改用對應的回環地址
+WILDCARD_PROBE_HOSTS = {"": "127.0.0.1", "0.0.0.0": "127.0.0.1", "::": "::1"}
+
+
 class PortManager:
     """端口管理器 - 提供增強的端口管理功能"""
 
@@ -108,40 +115,58 @@ class PortManager:
             return False
 
     @staticmethod
-    def is_port_available(host: str, port: int) -> bool:
+    def is_port_available(host: str, port: int, strict: bool = False) -> bool:
         """
         檢查端口是否可用
 
+        預設以連接探測是否有進程在監聽，探測本身不會佔用端口；
+        strict 為 True 時改為實際綁定端口，確認此刻可被獨佔。
+
         Args:
             host: 主機地址
             port: 端口號
+            strict: 是否以綁定方式檢查
 
         Returns:
             bool: 端口是否可用
         """
-        try:
-            # 首先嘗試不使用 SO_REUSEADDR 來檢測端口
+        if strict:
+            # 不使用 SO_REUSEADDR，與伺服器實際綁定的條件一致
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.bind((host, port))
-                return True
+                return PortManager._try_bind(sock, host, port)
+
+        probe_host = WILDCARD_PROBE_HOSTS.get(host, host)
+        family = socket.AF_INET6 if ":" in probe_host else socket.AF_INET
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(PORT_PROBE_TIMEOUT)
+            return sock.connect_ex((probe_host, port)) != 0
+
+    @staticmethod
+    def _try_bind(sock: socket.socket, host: str, port: int) -> bool:
+        """嘗試綁定端口，失敗時 socket 保持未綁定狀態，可繼續嘗試其他端口"""
+        try:
+            sock.bind((host, port))
+            return True
         except OSError:
-            # 如果綁定失敗，再檢查是否真的有進程在監聽
-            # 使用 psutil 檢查是否有進程在監聽該端口
-            try:
-                import psutil
-
-                for conn in psutil.net_connections(kind="inet"):
-                    if (
-                        conn.laddr.port == port
-                        and conn.laddr.ip in [host, "0.0.0.0", "::"]
-                        and conn.status == psutil.CONN_LISTEN
-                    ):
-                        return False
-                # 沒有找到監聽的進程，可能是臨時占用，認為可用
-                return True
-            except Exception:
-                # 如果 psutil 檢查失敗，保守地認為端口不可用
-                return False
+            return False
+
+    @staticmethod
+    def _get_listening_ports(host: str) -> set[int] | None:
+        """
+        使用 psutil 一次性獲取正在監聽的端口
+
+        Returns:
+            set[int] | None: 監聽中的端口集合，psutil 檢查失敗時返回 None
+        """
+        try:
+            return {
+                conn.laddr.port
+                for conn in psutil.net_connections(kind="inet")
+                if conn.status == psutil.CONN_LISTEN
+                and conn.laddr.ip in (host, "0.0.0.0", "::")
+            }
+        except Exception:
+            return None
 
     @staticmethod
     def find_free_port_enhanced(
@@ -166,7 +191,7 @@ class PortManager:
             RuntimeError: 如果找不到可用端口
         """
         # 首先嘗試偏好端口
-        if PortManager.is_port_available(host, preferred_port):
+        if PortManager.is_port_available(host, preferred_port, strict=True):
             debug_log(f"偏好端口 {preferred_port} 可用")
             return preferred_port
 
@@ -185,25 +210,33 @@ class PortManager:
                     if PortManager.kill_process_on_port(preferred_port):
                         # 等待一下讓端口釋放
                         time.sleep(1)
-                        if PortManager.is_port_available(host, preferred_port):
+                        if PortManager.is_port_available(
+                            host, preferred_port, strict=True
+                        ):
                             debug_log(f"成功清理端口 {preferred_port}，現在可用")
                             return preferred_port
 
         # 如果偏好端口仍不可用，尋找其他端口
         debug_log(f"偏好端口 {preferred_port} 不可用，尋找其他可用端口")
 
-        for i in range(max_attempts):
-            port = preferred_port + i + 1
-            if PortManager.is_port_available(host, port):
-                debug_log(f"找到可用端口: {port}")
-                return port
-
-        # 如果向上查找失敗，嘗試向下查找
-        for i in range(1, min(preferred_port - 1024, max_attempts)):
-            port = preferred_port - i
-            if port < 1024:  # 避免使用系統保留端口
-                break
-            if PortManager.is_port_available(host, port):
+        # 先向上查找，失敗後再向下查找（避免使用系統保留端口）
+        candidates: list[int] = [
+            *range(preferred_port + 1, preferred_port + max_attempts + 1),
+            *range(preferred_port - 1, max(preferred_port - max_attempts, 1024), -1),
+        ]
+        # 整個掃描共用一個 socket，並只在首次綁定失敗時查詢一次監聽端口，
+        # 而非對每個被占用的端口都遍歷系統所有連接
+        listening_ports: set[int] | None = None
+        listening_checked = False
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            for port in candidates:
+                if not PortManager._try_bind(sock, host, port):
+                    if not listening_checked:
+                        listening_ports = PortManager._get_listening_ports(host)
+                        listening_checked = True
+                    # psutil 檢查失敗時保守地認為端口不可用
+                    if listening_ports is None or port in listening_ports:
+                        continue
                 debug_log(f"找到可用端口: {port}")
                 return port
 
@@ -269,6 +269,7 @@ class SessionCleanupManager:
 
         # 按優先級排序會話（優先清理舊的、非活躍的會話）
         session_priorities = []
+        now = time.time()
         for session_id, session in sessions.items():
             # 跳過當前活躍會話（如果啟用保護）
             if (
@@ -292,11 +293,11 @@ class SessionCleanupManager:
                 priority_score += 50
 
             # 年齡優先級
-            age = session.get_age()
+            age = session.get_age(now)
             priority_score += age / 60  # 每分鐘加1分
 
             # 空閒時間優先級
-            idle_time = session.get_idle_time()
+            idle_time = session.get_idle_time(now)
             priority_score += idle_time / 30  # 每30秒加1分
 
             session_priorities.append((session_id, session, priority_score))
@@ -319,10 +320,14 @@ class SessionCleanupManager:
     def _cleanup_expired_sessions(self) -> int:
         """清理過期會話"""
         expired_sessions = []
+        now = time.time()
 
         for session_id, session in self.web_ui_manager.sessions.items():
             # 檢查是否過期
-            if session.is_expired() or session.get_age() > self.policy.max_session_age:
+            if (
+                session.is_expired(now)
+                or session.get_age(now) > self.policy.max_session_age
+            ):
                 expired_sessions.append(session_id)
 
         # 清理過期會話
@@ -350,6 +355,7 @@ class SessionCleanupManager:
     def _cleanup_idle_sessions(self) -> int:
         """清理空閒會話"""
         idle_sessions = []
+        now = time.time()
 
         for session_id, session in self.web_ui_manager.sessions.items():
             # 跳過當前活躍會話（如果啟用保護）
@@ -361,7 +367,7 @@ class SessionCleanupManager:
                 continue
 
             # 檢查是否空閒時間過長
-            if session.get_idle_time() > self.policy.max_idle_time:
+            if session.get_idle_time(now) > self.policy.max_idle_time:
                 idle_sessions.append(session_id)
 
         # 清理空閒會話
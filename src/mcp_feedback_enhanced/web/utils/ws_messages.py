@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+WebSocket 消息編碼工具
+======================
+
+使用 orjson 序列化 WebSocket 消息。前端以字串解析 event.data，
+因此統一以文字幀發送，而非二進位幀。
+
+前端提交附帶圖片的回饋時使用二進位幀，避免 base64 膨脹與解碼：
+    [4 字節大端序標頭長度][JSON 標頭][圖片 1 原始字節][圖片 2 原始字節]...
+JSON 標頭即一般的消息，其 images 僅含 name / type / size，
+各圖片的原始字節按 size 依序拼接於標頭之後。
+
+心跳同樣使用固定長度的二進位幀，伺服器原樣回傳作為心跳回應：
+    [1 字節類型標記 0x01][8 字節大端序 float64 時間戳]
+"""
+
+import struct
+from functools import cache
+from typing import Any
+
+import orjson
+
+
+def encode_message(message: dict[str, Any]) -> str:
+    """將消息序列化為 JSON 文本"""
+    text: str = orjson.dumps(message).decode()
+    return text
+
+
+@cache
+def encode_static_message(**fields: Any) -> str:
+    """序列化內容固定的消息並快取結果（欄位值須可雜湊）"""
+    return encode_message(fields)
+
+
+async def send_message(websocket: Any, message: dict[str, Any]) -> None:
+    """以 orjson 序列化消息並通過 WebSocket 以文字幀發送"""
+    await websocket.send_text(encode_message(message))
+
+
+# 二進位幀標頭長度前綴（4 字節大端序）
+BINARY_HEADER_PREFIX = struct.Struct(">I")
+
+
+# 心跳二進位幀格式（類型標記 + 時間戳）
+HEARTBEAT_FRAME = struct.Struct(">Bd")
+HEARTBEAT_FRAME_TAG = 0x01
+
+
+def is_heartbeat_frame(frame: bytes) -> bool:
+    """判斷二進位幀是否為心跳幀"""
+    return len(frame) == HEARTBEAT_FRAME.size and frame[0] == HEARTBEAT_FRAME_TAG
+
+
+def is_binary_message(frame: bytes) -> bool:
+    """判斷二進位幀是否為附帶圖片的消息（標頭長度前綴首字節必為 0，JSON 則以 { 開頭）"""
+    return frame[:1] == b"\x00"
+
+
+def decode_binary_message(frame: bytes) -> dict[str, Any]:
+    """
+    解析附帶圖片原始字節的二進位消息
+
+    圖片數據以 memoryview 切片引用原始幀，不另行複製。
+
+    Raises:
+        ValueError: 幀格式不正確
+    """
+    prefix_size = BINARY_HEADER_PREFIX.size
+    if len(frame) < prefix_size:
+        raise ValueError("二進位消息長度不足")
+    (header_size,) = BINARY_HEADER_PREFIX.unpack_from(frame)
+    offset = prefix_size + header_size
+    if offset > len(frame):
+        raise ValueError("二進位消息標頭長度超出幀大小")
+
+    view = memoryview(frame)
+    message = orjson.loads(view[prefix_size:offset])
+    if not isinstance(message, dict) or not isinstance(
+        images := message.get("images", []), list
+    ):
+        raise ValueError("二進位消息標頭格式不正確")
+
+    for image in images:
+        size = image.get("size") if isinstance(image, dict) else None
+        if not isinstance(size, int) or size < 0 or offset + size > len(frame):
+            raise ValueError("二進位消息圖片大小不正確")
+        image["data"] = view[offset : offset + size]
+        offset += size
+
+    if offset != len(frame):
+        raise ValueError("二進位消息含有多餘數據")
+    return message
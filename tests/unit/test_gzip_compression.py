@@ -135,6 +135,38 @@ class TestCompressionManager:
         assert stats["requests_compressed"] == 1
         assert stats["compression_percentage"] == 50.0  # 1/2 * 100
 
+    def test_update_stats_batch(self):
+        """測試批量統計更新"""
+        manager = CompressionManager()
+
+        manager.update_stats_batch(4, 1, 4096, 2048)
+        stats = manager.get_stats()
+
+        assert stats["requests_total"] == 4
+        assert stats["requests_compressed"] == 1
+        assert stats["bytes_original"] == 4096
+        assert stats["bytes_compressed"] == 2048
+        assert stats["compression_ratio"] == 50.0  # (4096-2048)/4096 * 100
+        assert stats["compression_percentage"] == 25.0  # 1/4 * 100
+
+    def test_cached_path_classification(self):
+        """測試路徑分類快取與緩存頭生成"""
+        manager = CompressionManager(CompressionConfig())
+
+        assert manager.should_exclude_path("/ws") == True
+        assert manager.should_exclude_path("/static/js/app.js") == False
+
+        static_headers = dict(manager.iter_cache_headers("/static/js/app.js"))
+        assert static_headers["Cache-Control"] == "public, max-age=3600"
+        assert static_headers["Expires"].endswith("GMT")
+
+        other_headers = dict(manager.iter_cache_headers("/feedback"))
+        assert other_headers == manager.config.get_cache_headers("/feedback")
+
+        # 重複路徑應命中快取
+        list(manager.iter_cache_headers("/static/js/app.js"))
+        assert manager._get_cache_policy.cache_info().hits >= 1
+
     def test_reset_stats(self):
         """測試統計重置"""
         manager = CompressionManager()
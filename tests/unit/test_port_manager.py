@@ -11,6 +11,7 @@ import socket
 import time
 from unittest.mock import patch
 
+import psutil
 import pytest
 
 # 移除手動路徑操作，讓 mypy 和 pytest 使用正確的模組解析
@@ -45,6 +46,18 @@ class TestPortManager:
         finally:
             server_socket.close()
 
+    def test_is_port_available_bound_but_not_listening(self):
+        """測試已綁定但未監聽的端口：連接探測視為可用，strict 模式視為不可用"""
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as bound_socket:
+            bound_socket.bind(("127.0.0.1", 0))
+            bound_port = bound_socket.getsockname()[1]
+
+            assert PortManager.is_port_available("127.0.0.1", bound_port) is True
+            assert (
+                PortManager.is_port_available("127.0.0.1", bound_port, strict=True)
+                is False
+            )
+
     def test_find_free_port_enhanced_preferred_available(self):
         """測試當偏好端口可用時的行為"""
         # 找一個空閒端口作為偏好端口
@@ -80,6 +93,55 @@ class TestPortManager:
         finally:
             server_socket.close()
 
+    def test_find_free_port_enhanced_skips_bound_preferred_port(self):
+        """測試偏好端口已綁定但未監聽時仍視為不可用，不會返回給伺服器"""
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as bound_socket:
+            bound_socket.bind(("127.0.0.1", 0))
+            bound_port = bound_socket.getsockname()[1]
+
+            result_port = PortManager.find_free_port_enhanced(
+                preferred_port=bound_port, auto_cleanup=False
+            )
+            assert result_port != bound_port
+
+    def test_find_free_port_enhanced_queries_listeners_once(self):
+        """測試掃描多個被占用端口時只查詢一次監聽端口"""
+
+        def occupy_consecutive_ports(count):
+            for _ in range(20):
+                sockets = []
+                try:
+                    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                        s.bind(("127.0.0.1", 0))
+                        start = s.getsockname()[1]
+                    for port in range(start, start + count):
+                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                        sockets.append(sock)
+                        sock.bind(("127.0.0.1", port))
+                        sock.listen(1)
+                    return start, sockets
+                except OSError:
+                    for sock in sockets:
+                        sock.close()
+            pytest.skip("無法占用連續端口")
+
+        start, sockets = occupy_consecutive_ports(3)
+        try:
+            with patch(
+                "mcp_feedback_enhanced.web.utils.port_manager.psutil.net_connections",
+                wraps=psutil.net_connections,
+            ) as net_connections:
+                result_port = PortManager.find_free_port_enhanced(
+                    preferred_port=start, auto_cleanup=False
+                )
+
+            assert result_port > start + 2
+            # 偏好端口以連接探測，整個掃描只查詢一次
+            assert net_connections.call_count == 1
+        finally:
+            for sock in sockets:
+                sock.close()
+
     def test_find_process_using_port_no_process(self):
         """測試查找沒有進程占用的端口"""
         # 找一個空閒端口
@@ -11,6 +11,7 @@ import time
 from unittest.mock import Mock
 
 import pytest
+from starlette.websockets import WebSocketState
 
 # 移除手動路徑操作，讓 mypy 和 pytest 使用正確的模組解析
 from mcp_feedback_enhanced.web.models.feedback_session import (
@@ -108,6 +109,72 @@ class TestWebFeedbackSessionCleanup:
         assert self.session.cleanup_timer != old_timer
         assert self.session.cleanup_timer.is_alive()
 
+    def test_timers_share_one_scheduler_thread(self):
+        """測試多個會話的定時器共用同一排程線程，並按截止時間觸發"""
+        import threading
+
+        from mcp_feedback_enhanced.web.models.feedback_session import (
+            _timer_scheduler,
+        )
+
+        sessions = [
+            WebFeedbackSession(f"timer_{i}", self.project_dir, self.summary)
+            for i in range(5)
+        ]
+        thread_count = threading.active_count()
+        sessions.append(WebFeedbackSession("timer_5", self.project_dir, self.summary))
+        assert threading.active_count() == thread_count
+
+        fired: list[str] = []
+        done = threading.Event()
+
+        def on_late() -> None:
+            fired.append("late")
+            done.set()
+
+        def on_cancelled() -> None:
+            fired.append("cancelled")
+
+        def on_early() -> None:
+            fired.append("early")
+
+        _timer_scheduler.schedule(0.1, on_late)
+        cancelled = _timer_scheduler.schedule(0.02, on_cancelled)
+        _timer_scheduler.schedule(0.01, on_early)
+        cancelled.cancel()
+
+        assert done.wait(2)
+        assert fired == ["early", "late"]
+        assert not cancelled.is_alive()
+
+        for session in sessions:
+            session._cleanup_sync_enhanced(CleanupReason.MANUAL)
+
+    def test_slow_timer_callback_does_not_delay_others(self):
+        """測試耗時的定時回調不會延誤其他到期的回調"""
+        import threading
+
+        from mcp_feedback_enhanced.web.models.feedback_session import (
+            _timer_scheduler,
+        )
+
+        release = threading.Event()
+        fast_done = threading.Event()
+
+        def on_slow() -> None:
+            release.wait(2)
+
+        def on_fast() -> None:
+            fast_done.set()
+
+        _timer_scheduler.schedule(0.01, on_slow)
+        _timer_scheduler.schedule(0.02, on_fast)
+
+        try:
+            assert fast_done.wait(1)
+        finally:
+            release.set()
+
     def test_cleanup_callbacks(self):
         """測試清理回調函數"""
         callback_called = False
@@ -154,16 +221,28 @@ class TestWebFeedbackSessionCleanup:
         assert stats["last_cleanup_time"] is not None
         assert stats["cleanup_duration"] >= 0
 
+    @pytest.mark.asyncio
+    async def test_concurrent_cleanup_runs_once(self):
+        """測試同步與異步清理同時觸發時只執行一次"""
+        await asyncio.gather(
+            asyncio.to_thread(
+                self.session._cleanup_sync_enhanced, CleanupReason.EXPIRED
+            ),
+            self.session._cleanup_resources_enhanced(CleanupReason.EXPIRED),
+        )
+
+        assert self.session.get_cleanup_stats()["cleanup_count"] == 1
+
     @pytest.mark.asyncio
     async def test_async_cleanup(self):
         """測試異步清理"""
         # 模擬 WebSocket 連接
         mock_websocket = Mock()
-        mock_websocket.send_json = Mock(return_value=asyncio.Future())
-        mock_websocket.send_json.return_value.set_result(None)
+        mock_websocket.send_text = Mock(return_value=asyncio.Future())
+        mock_websocket.send_text.return_value.set_result(None)
         mock_websocket.close = Mock(return_value=asyncio.Future())
         mock_websocket.close.return_value.set_result(None)
-        mock_websocket.client_state.DISCONNECTED = False
+        mock_websocket.client_state = WebSocketState.CONNECTED
 
         self.session.websocket = mock_websocket
 
@@ -171,13 +250,114 @@ class TestWebFeedbackSessionCleanup:
         await self.session._cleanup_resources_enhanced(CleanupReason.TIMEOUT)
 
         # 檢查 WebSocket 是否被正確處理
-        mock_websocket.send_json.assert_called_once()
+        mock_websocket.send_text.assert_called_once()
 
         # 檢查清理統計
         stats = self.session.get_cleanup_stats()
         assert stats["cleanup_count"] == 1
         assert stats["cleanup_reason"] == CleanupReason.TIMEOUT.value
 
+    @pytest.mark.asyncio
+    async def test_async_cleanup_skips_disconnected_websocket(self):
+        """測試客戶端已斷開時清理不再發送通知"""
+        mock_websocket = Mock()
+        mock_websocket.client_state = WebSocketState.DISCONNECTED
+        self.session.websocket = mock_websocket
+
+        await self.session._cleanup_resources_enhanced(CleanupReason.TIMEOUT)
+
+        mock_websocket.send_text.assert_not_called()
+        mock_websocket.close.assert_not_called()
+        assert self.session.websocket is None
+
+    @pytest.mark.asyncio
+    async def test_async_cleanup_runs_sync_and_async_callbacks(self):
+        """測試異步清理同時調用同步與異步回調，單個回調失敗不影響其他回調"""
+        calls = []
+
+        def sync_callback(session, reason):
+            calls.append(("sync", reason))
+
+        async def async_callback(session, reason):
+            calls.append(("async", reason))
+
+        async def failing_callback(session, reason):
+            raise RuntimeError("回調失敗")
+
+        for callback in (sync_callback, async_callback, failing_callback):
+            self.session.add_cleanup_callback(callback)
+        self.session.add_cleanup_callback(sync_callback)
+        assert len(self.session.cleanup_callbacks) == 3
+
+        await self.session._cleanup_resources_enhanced(CleanupReason.MANUAL)
+
+        assert sorted(calls) == [
+            ("async", CleanupReason.MANUAL),
+            ("sync", CleanupReason.MANUAL),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_auto_cleanup_runs_on_websocket_loop(self):
+        """測試自動清理提交到附加 WebSocket 的事件循環，而非建立會話的循環"""
+        import threading
+
+        loop = asyncio.get_running_loop()
+        cleaned = asyncio.Event()
+        callback_loops = []
+
+        def on_cleanup(session, reason):
+            callback_loops.append(asyncio.get_running_loop())
+            cleaned.set()
+
+        # 在另一個線程的事件循環中建立會話（模擬 MCP 調用方的循環）
+        created: list[WebFeedbackSession] = []
+
+        async def create_session():
+            created.append(
+                WebFeedbackSession(
+                    "auto_cleanup_session",
+                    self.project_dir,
+                    self.summary,
+                    auto_cleanup_delay=1,
+                    max_idle_time=-1,
+                )
+            )
+
+        creator = threading.Thread(target=asyncio.run, args=(create_session(),))
+        creator.start()
+        creator.join()
+        session = created[0]
+        session.add_cleanup_callback(on_cleanup)
+
+        # WebSocket 在當前循環（模擬 uvicorn 的循環）中附加
+        session.attach_websocket(Mock())
+
+        await asyncio.wait_for(cleaned.wait(), 3)
+        assert callback_loops == [loop]
+        assert session.status == SessionStatus.EXPIRED
+        assert session.get_cleanup_stats()["cleanup_reason"] == "expired"
+
+    def test_auto_cleanup_without_websocket_falls_back_to_sync(self):
+        """測試沒有附加 WebSocket 時自動清理改用同步清理"""
+        import threading
+
+        cleaned = threading.Event()
+
+        def on_cleanup(session, reason):
+            cleaned.set()
+
+        session = WebFeedbackSession(
+            "auto_cleanup_sync_session",
+            self.project_dir,
+            self.summary,
+            auto_cleanup_delay=1,
+            max_idle_time=-1,
+        )
+        session.add_cleanup_callback(on_cleanup)
+
+        assert cleaned.wait(3)
+        assert session.status == SessionStatus.EXPIRED
+
     def test_status_update_resets_timer(self):
         """測試狀態更新重置定時器"""
         old_timer = self.session.cleanup_timer
@@ -4,6 +4,7 @@ Web UI 單元測試
 """
 
 import time
+from pathlib import Path
 
 import pytest
 
@@ -21,6 +22,20 @@ class TestWebUIManager:
         assert web_ui_manager.port > 0  # 應該分配了端口
         assert web_ui_manager.app is not None
 
+    def test_templates_precompiled(self, web_ui_manager, monkeypatch):
+        """測試頁面模板在啟動時已編譯並快取，非調試模式下不檢查檔案變更"""
+        from unittest.mock import patch
+
+        monkeypatch.delenv("MCP_DEBUG", raising=False)
+        web_ui_manager._setup_templates()
+        env = web_ui_manager.templates.env
+
+        assert env.auto_reload is False
+        loader = env.loader
+        with patch.object(loader, "get_source", side_effect=AssertionError):
+            env.get_template("index.html")
+            env.get_template("feedback.html")
+
     def test_web_ui_manager_session_management(self, web_ui_manager, test_project_dir):
         """測試會話管理"""
         # 測試創建會話
@@ -75,6 +90,49 @@ class TestWebUIManager:
         count = web_ui_manager.get_global_active_tabs_count()
         assert count == 1  # 只剩下有效的標籤頁
 
+    def test_session_update_payload_cache(self, web_ui_manager, test_project_dir):
+        """測試會話更新通知序列化快取"""
+        import json
+
+        web_ui_manager.create_session(str(test_project_dir), "快取測試")
+        session = web_ui_manager.get_current_session()
+
+        payload = web_ui_manager.get_session_update_payload(session)
+        data = json.loads(payload)
+        assert data["type"] == "session_updated"
+        assert data["session_info"]["session_id"] == session.session_id
+        assert data["session_info"]["summary"] == "快取測試"
+
+        # 內容未變時應重用同一個序列化結果
+        assert web_ui_manager.get_session_update_payload(session) is payload
+
+        # 狀態變更後應重新序列化
+        session.next_step()
+        updated = json.loads(web_ui_manager.get_session_update_payload(session))
+        assert updated["session_info"]["status"] == session.status.value
+
+    @pytest.mark.asyncio
+    async def test_smart_open_browser_does_not_block(self, web_ui_manager, monkeypatch):
+        """測試開啟瀏覽器在背景進行，不阻塞呼叫方"""
+        import asyncio
+
+        monkeypatch.delenv("MCP_DESKTOP_MODE", raising=False)
+        opened = []
+
+        def slow_open_browser(url):
+            time.sleep(0.5)
+            opened.append(url)
+
+        monkeypatch.setattr(web_ui_manager, "open_browser", slow_open_browser)
+
+        start = time.time()
+        has_active_tabs = await web_ui_manager.smart_open_browser("http://test")
+        assert time.time() - start < 0.3
+        assert has_active_tabs is False
+
+        await asyncio.gather(*web_ui_manager._background_tasks)
+        assert opened == ["http://test"]
+
 
 class TestWebFeedbackSession:
     """Web 回饋會話測試"""
@@ -162,6 +220,322 @@ class TestWebFeedbackSession:
         assert session.settings == TestData.SAMPLE_FEEDBACK["settings"]
         assert session.status == SessionStatus.FEEDBACK_SUBMITTED
 
+    @pytest.mark.asyncio
+    async def test_submit_feedback_decodes_images_off_loop(self, test_project_dir):
+        """測試提交回饋時圖片在工作線程中處理"""
+        import threading
+        from unittest.mock import patch
+
+        from mcp_feedback_enhanced.web.models import WebFeedbackSession
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        process_images = WebFeedbackSession._process_images
+        worker_threads = []
+
+        def record_thread(self, images):
+            worker_threads.append(threading.get_ident())
+            return process_images(self, images)
+
+        image = {"name": "a.png", "data": TestData.SAMPLE_IMAGE_BASE64, "size": 100}
+        with patch.object(WebFeedbackSession, "_process_images", record_thread):
+            await session.submit_feedback("回饋", [image], {})
+
+        assert worker_threads
+        assert worker_threads[0] != threading.get_ident()
+        assert len(session.images) == 1
+        session.cleanup()
+
+    def test_command_logs_bounded(self, test_project_dir):
+        """測試命令日誌有行數上限"""
+        from mcp_feedback_enhanced.web.models import WebFeedbackSession
+        from mcp_feedback_enhanced.web.models.feedback_session import (
+            MAX_COMMAND_LOG_LINES,
+        )
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        for i in range(MAX_COMMAND_LOG_LINES + 5):
+            session.add_log(f"line {i}")
+
+        assert len(session.command_logs) == MAX_COMMAND_LOG_LINES
+        assert session.command_logs[0] == "line 5"
+
+    def test_status_info_cached_until_state_changes(self, test_project_dir):
+        """測試狀態信息及其序列化消息在狀態未變時重用，狀態變化後重新生成"""
+        import json
+
+        from mcp_feedback_enhanced.web.models import WebFeedbackSession
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+
+        info = session.get_status_info()
+        assert session.get_status_info() is info
+        text = session.get_status_update_text()
+        assert session.get_status_update_text() is text
+        assert json.loads(text) == {"type": "status_update", "status_info": info}
+
+        session.next_step("會話已啟動")
+        updated = session.get_status_info()
+        assert updated is not info
+        assert json.loads(session.get_status_update_text())["status_info"] == updated
+        assert updated["status"] == "active"
+        assert updated["message"] == "會話已啟動"
+
+        session.websocket = object()
+        assert session.get_status_info()["has_websocket"] is True
+        session.cleanup()
+
+    def test_process_images_decodes_base64(self, test_project_dir):
+        """測試圖片 base64 解碼（含 data URL 前綴）"""
+        from mcp_feedback_enhanced.web.models import WebFeedbackSession
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        data_url = TestData.SAMPLE_IMAGE_BASE64
+        raw_images = [
+            {"name": "with-prefix.png", "data": data_url, "size": 100},
+            {"name": "raw.png", "data": data_url.partition(",")[2], "size": 100},
+            {"name": "invalid.png", "data": "不是 base64", "size": 100},
+        ]
+        images = session._process_images(raw_images)
+
+        assert [img["name"] for img in images] == ["with-prefix.png", "raw.png"]
+        # 原始 base64 數據在處理過程中逐項釋放
+        assert raw_images == []
+        session.images = images
+        image_paths = [Path(img["path"]) for img in images]
+        assert all(path.exists() for path in image_paths)
+        for img in session.load_images_for_response():
+            assert img["data"].startswith(b"\x89PNG")
+            assert img["size"] == len(img["data"])
+
+        # 清理後臨時文件應被刪除
+        session.cleanup()
+        assert session.images == []
+        assert not any(path.exists() for path in image_paths)
+
+    def test_process_images_filters_keys_and_types(self, test_project_dir):
+        """測試缺少必要欄位或類型不受支援的圖片會被跳過"""
+        from mcp_feedback_enhanced.web.models import WebFeedbackSession
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        data_url = TestData.SAMPLE_IMAGE_BASE64
+        images = session._process_images(
+            [
+                {"name": "no-size.png", "data": data_url},
+                {
+                    "name": "doc.pdf",
+                    "data": data_url,
+                    "size": 100,
+                    "type": "application/pdf",
+                },
+                {
+                    "name": "typed.png",
+                    "data": data_url,
+                    "size": 100,
+                    "type": "image/png",
+                },
+                {"name": "untyped.png", "data": data_url, "size": 100},
+            ]
+        )
+
+        assert [img["name"] for img in images] == ["typed.png", "untyped.png"]
+
+    def test_process_images_rejects_oversized_before_decode(self, test_project_dir):
+        """測試以 base64 長度提前拒絕超過大小限制的圖片"""
+        import base64
+
+        from mcp_feedback_enhanced.web.models import WebFeedbackSession
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        session.settings = {"image_size_limit": 1000}
+
+        fits = base64.b64encode(b"x" * 1000).decode()
+        too_big = base64.b64encode(b"x" * 1001).decode()
+        images = session._process_images(
+            [
+                # 聲明大小未超限，但實際數據超過限制
+                {"name": "too-big.png", "data": too_big, "size": 10},
+                {"name": "fits.png", "data": fits, "size": 10},
+            ]
+        )
+
+        assert [img["name"] for img in images] == ["fits.png"]
+        assert images[0]["size"] == 1000
+
+    @pytest.mark.asyncio
+    async def test_wait_for_feedback_set_from_other_thread(self, test_project_dir):
+        """測試其他線程設置完成事件時等待立即結束"""
+        import threading
+
+        from mcp_feedback_enhanced.web.models import WebFeedbackSession
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        session.feedback_result = "跨線程回饋"
+
+        timer = threading.Timer(0.05, session.feedback_completed.set)
+        timer.start()
+
+        start = time.time()
+        result = await session.wait_for_feedback(timeout=30)
+
+        assert time.time() - start < 2
+        assert session.feedback_completed.is_set()
+        assert result["interactive_feedback"] == "跨線程回饋"
+
+    @pytest.mark.asyncio
+    async def test_wait_for_feedback_timeout(self, test_project_dir):
+        """測試等待超時拋出 FeedbackTimeoutError 並只清理一次"""
+        from unittest.mock import AsyncMock, patch
+
+        from mcp_feedback_enhanced.web.models import (
+            FeedbackTimeoutError,
+            WebFeedbackSession,
+        )
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        cleanup = AsyncMock()
+
+        async def expire(awaitable, timeout):
+            awaitable.close()
+            raise TimeoutError
+
+        with (
+            patch.object(WebFeedbackSession, "_cleanup_resources_on_timeout", cleanup),
+            patch(
+                "mcp_feedback_enhanced.web.models.feedback_session.asyncio.wait_for",
+                expire,
+            ),
+            pytest.raises(TimeoutError) as exc_info,
+        ):
+            await session.wait_for_feedback(timeout=60)
+
+        assert isinstance(exc_info.value, FeedbackTimeoutError)
+        assert exc_info.value.timeout == 55
+        assert str(exc_info.value) == "等待用戶回饋超時（55秒），介面已自動關閉"
+        assert exc_info.value.__cause__ is None
+        cleanup.assert_awaited_once()
+        session.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_run_command_batches_output(self, test_project_dir):
+        """測試命令輸出合併為批次幀並在完成信號之前送達"""
+        import asyncio
+        import json
+        import sys
+
+        from mcp_feedback_enhanced.web.models import WebFeedbackSession
+
+        class FakeWebSocket:
+            def __init__(self):
+                self.sent = []
+
+            async def send_text(self, text):
+                self.sent.append(json.loads(text))
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        session.websocket = FakeWebSocket()
+
+        await session.run_command(
+            f'"{sys.executable}" -c "for i in range(200): print(i)"'
+        )
+        for _ in range(200):
+            if any(m["type"] == "command_complete" for m in session.websocket.sent):
+                break
+            await asyncio.sleep(0.05)
+
+        messages = session.websocket.sent
+        assert messages[-1] == {"type": "command_complete", "exit_code": 0}
+        outputs = [m["output"] for m in messages if m["type"] == "command_output"]
+        assert "".join(outputs) == "".join(f"{i}\n" for i in range(200))
+        assert len(outputs) < 200
+
+    @pytest.mark.asyncio
+    async def test_cleanup_terminates_running_command(self, test_project_dir):
+        """測試清理會話時終止正在運行的命令"""
+        import asyncio
+        import sys
+
+        from mcp_feedback_enhanced.web.models import WebFeedbackSession
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        await session.run_command(
+            f'"{sys.executable}" -c "__import__(\'time\').sleep(30)"'
+        )
+        process = session.process
+        assert process is not None and process.returncode is None
+
+        # 從其他線程調用同步清理，終止操作應轉交到進程所屬的事件循環
+        await asyncio.to_thread(session._terminate_process)
+        # wait() 返回即表示進程已結束（returncode 已設定）
+        await asyncio.wait_for(process.wait(), timeout=5)
+
+        assert session.process is None
+
+    @pytest.mark.asyncio
+    async def test_session_send_queue(self, test_project_dir):
+        """測試廣播發送佇列的合併與上限"""
+        import asyncio
+        import json
+
+        from mcp_feedback_enhanced.web.models import WebFeedbackSession
+        from mcp_feedback_enhanced.web.models.feedback_session import (
+            SEND_QUEUE_MAXSIZE,
+        )
+
+        class FakeWebSocket:
+            def __init__(self):
+                self.sent = []
+
+            async def send_text(self, text):
+                self.sent.append(json.loads(text))
+
+        session = WebFeedbackSession(
+            "test-session", str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        session.websocket = FakeWebSocket()
+
+        # 連續的會話更新通知只保留最新一則
+        session.enqueue_message({"type": "status_update", "n": 0})
+        session.enqueue_message({"type": "session_updated", "n": 1})
+        session.enqueue_message({"type": "session_updated", "n": 2})
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert session.websocket.sent == [
+            {"type": "status_update", "n": 0},
+            {"type": "session_updated", "n": 2},
+        ]
+
+        # 佇列滿時丟棄最舊消息
+        session.websocket.sent.clear()
+        for i in range(SEND_QUEUE_MAXSIZE + 10):
+            session.enqueue_message({"type": "command_output", "n": i})
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert len(session.websocket.sent) == SEND_QUEUE_MAXSIZE
+        assert session.websocket.sent[0]["n"] == 10
+
+        session._stop_sender()
+        await asyncio.sleep(0)
+
 
 class TestWebUIRoutes:
     """Web UI 路由測試"""
@@ -180,6 +554,8 @@ class TestWebUIRoutes:
     @pytest.mark.asyncio
     async def test_index_route_with_session(self, web_ui_manager, test_project_dir):
         """測試主頁路由（有會話）"""
+        from unittest.mock import patch
+
         from fastapi.testclient import TestClient
 
         # 創建會話
@@ -193,6 +569,14 @@ class TestWebUIRoutes:
         assert response.status_code == 200
         assert TestData.SAMPLE_SESSION["summary"] in response.text
 
+        # 同一會話重複載入時使用已渲染的頁面
+        template = web_ui_manager.templates.get_template("feedback.html")
+        with patch.object(template, "render", side_effect=AssertionError):
+            assert client.get("/").text == response.text
+
+        web_ui_manager.create_session(str(test_project_dir), "新的會話摘要")
+        assert "新的會話摘要" in client.get("/").text
+
     @pytest.mark.asyncio
     async def test_api_current_session(self, web_ui_manager, test_project_dir):
         """測試當前會話 API"""
@@ -212,6 +596,327 @@ class TestWebUIRoutes:
         assert data["project_directory"] == str(test_project_dir)
         assert data["summary"] == TestData.SAMPLE_SESSION["summary"]
 
+    def test_api_translations_cached_until_file_changes(
+        self, web_ui_manager, tmp_path, monkeypatch
+    ):
+        """測試翻譯 API 在翻譯檔案未變更時使用快取"""
+        import os
+
+        from fastapi.testclient import TestClient
+
+        from mcp_feedback_enhanced.web.routes import main_routes
+
+        translation_file = tmp_path / "en" / "translation.json"
+        translation_file.parent.mkdir()
+        translation_file.write_text('{"title": "v1"}', encoding="utf-8")
+        monkeypatch.setattr(main_routes, "WEB_LOCALES_DIR", tmp_path)
+        main_routes._build_translations_payload.cache_clear()
+
+        client = TestClient(web_ui_manager.app)
+        response = client.get("/api/translations")
+        assert response.status_code == 200
+        assert response.json() == {"zh-TW": {}, "zh-CN": {}, "en": {"title": "v1"}}
+
+        etag = response.headers["etag"]
+        not_modified = client.get("/api/translations", headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert main_routes._build_translations_payload.cache_info().hits == 1
+
+        # 檔案修改時間變更後重新載入
+        translation_file.write_text('{"title": "v2"}', encoding="utf-8")
+        stat = translation_file.stat()
+        os.utime(translation_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        response = client.get("/api/translations", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["en"] == {"title": "v2"}
+
+        main_routes._build_translations_payload.cache_clear()
+
+    def test_settings_store_caches_until_saved(
+        self, web_ui_manager, tmp_path, monkeypatch
+    ):
+        """測試 UI 設定保存後直接使用快取並延遲寫入，檔案被外部修改時重新載入"""
+        from unittest.mock import patch
+
+        from fastapi.testclient import TestClient
+
+        from mcp_feedback_enhanced.web.routes import main_routes
+
+        monkeypatch.setattr(main_routes, "UI_SETTINGS_FILE", tmp_path / "ui.json")
+        monkeypatch.setattr(main_routes, "SETTINGS_WRITE_DELAY", 60)
+        client = TestClient(web_ui_manager.app)
+
+        assert client.get("/api/log-level").json() == {"logLevel": "INFO"}
+        assert client.post("/api/log-level", json={"logLevel": "DEBUG"}).is_success
+
+        with patch.object(
+            main_routes.orjson, "loads", wraps=main_routes.orjson.loads
+        ) as json_load:
+            assert client.get("/api/log-level").json() == {"logLevel": "DEBUG"}
+            assert client.get("/api/load-settings").json() == {"logLevel": "DEBUG"}
+            assert main_routes.load_user_layout_settings() == "combined-vertical"
+        # 保存時已更新快取，後續讀取無需重新解析檔案
+        assert json_load.call_count == 0
+
+        # 連續保存只在延遲後寫入最後一次的設定
+        settings_file = main_routes._settings_store.settings_file
+        for layout_mode in ("separate", "combined-horizontal"):
+            response = client.post(
+                "/api/save-settings", json={"layoutMode": layout_mode}
+            )
+            assert response.is_success
+        assert not settings_file.exists()
+        main_routes._settings_store.flush()
+        assert settings_file.read_text() == '{"layoutMode":"combined-horizontal"}'
+
+        settings_file.write_text('{"layoutMode": "combined-vertical"}')
+        assert main_routes.load_user_layout_settings() == "combined-vertical"
+
+        assert client.post("/api/clear-settings").is_success
+        assert client.get("/api/load-settings").json() == {}
+
+    def test_session_history_saved_atomically(
+        self, web_ui_manager, tmp_path, monkeypatch
+    ):
+        """測試會話歷史以原子替換方式寫入，不留下臨時檔案"""
+        from fastapi.testclient import TestClient
+
+        from mcp_feedback_enhanced.web.routes import main_routes
+
+        config_dir = tmp_path / "config"
+        monkeypatch.setattr(
+            main_routes, "SESSION_HISTORY_FILE", config_dir / "session_history.json"
+        )
+        client = TestClient(web_ui_manager.app)
+
+        sessions = [{"session_id": "s1", "summary": "摘要"}]
+        response = client.post(
+            "/api/save-session-history",
+            json={"sessions": sessions, "lastCleanup": 123},
+        )
+        assert response.is_success
+
+        assert [p.name for p in config_dir.iterdir()] == ["session_history.json"]
+        assert client.get("/api/load-session-history").json() == {
+            "sessions": sessions,
+            "lastCleanup": 123,
+        }
+
+    def test_write_json_atomic_retries_permission_error(self, tmp_path, monkeypatch):
+        """測試替換目標被佔用（Windows 上的 PermissionError）時重試，持續失敗則拋出"""
+        import os
+
+        from mcp_feedback_enhanced.web.routes import main_routes
+
+        monkeypatch.setattr(main_routes, "JSON_REPLACE_RETRY_DELAY", 0)
+        real_replace = os.replace
+        denied: list[Path] = []
+
+        def flaky_replace(src, dst):
+            if len(denied) < 2:
+                denied.append(dst)
+                raise PermissionError("檔案正被使用")
+            real_replace(src, dst)
+
+        target = tmp_path / "history.json"
+        monkeypatch.setattr(main_routes.os, "replace", flaky_replace)
+        main_routes._write_json_atomic(target, {"ok": True})
+        assert len(denied) == 2
+        assert target.read_bytes() == b'{"ok":true}'
+
+        def always_denied(src, dst):
+            raise PermissionError("檔案正被使用")
+
+        monkeypatch.setattr(main_routes.os, "replace", always_denied)
+        with pytest.raises(PermissionError):
+            main_routes._write_json_atomic(target, {"ok": False})
+        assert [p.name for p in tmp_path.iterdir()] == ["history.json"]
+        assert target.read_bytes() == b'{"ok":true}'
+
+    def test_websocket_accepts_text_and_binary_frames(
+        self, web_ui_manager, test_project_dir
+    ):
+        """測試 WebSocket 同時接受文字幀與二進位幀的 JSON 消息"""
+        from fastapi.testclient import TestClient
+
+        web_ui_manager.create_session(
+            str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        client = TestClient(web_ui_manager.app)
+
+        with client.websocket_connect("/ws") as ws:
+            assert ws.receive_json()["type"] == "connection_established"
+
+            def heartbeat_response():
+                while (message := ws.receive_json())["type"] != "heartbeat_response":
+                    pass
+                return message
+
+            ws.send_bytes(b'{"type": "heartbeat", "timestamp": 1}')
+            assert heartbeat_response()["timestamp"] == 1
+            ws.send_text('{"type": "heartbeat", "timestamp": 2}')
+            assert heartbeat_response()["timestamp"] == 2
+
+    def test_websocket_binary_heartbeat_echoed(self, web_ui_manager, test_project_dir):
+        """測試二進位心跳幀被原樣回傳並更新心跳時間"""
+        from fastapi.testclient import TestClient
+
+        from mcp_feedback_enhanced.web.utils.ws_messages import (
+            HEARTBEAT_FRAME,
+            HEARTBEAT_FRAME_TAG,
+        )
+
+        session_id = web_ui_manager.create_session(
+            str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        session = web_ui_manager.sessions[session_id]
+        session.last_heartbeat = None
+        client = TestClient(web_ui_manager.app)
+        frame = HEARTBEAT_FRAME.pack(HEARTBEAT_FRAME_TAG, 1700000000000.0)
+
+        with client.websocket_connect("/ws") as ws:
+            ws.send_bytes(frame)
+            while "bytes" not in (message := ws.receive()):
+                pass
+            assert message["bytes"] == frame
+
+        assert session.last_heartbeat is not None
+
+    def test_websocket_status_update_not_resent(self, web_ui_manager, test_project_dir):
+        """測試客戶端已收到相同狀態時 get_status 不重複發送"""
+        from fastapi.testclient import TestClient
+
+        from mcp_feedback_enhanced.web.utils.ws_messages import (
+            HEARTBEAT_FRAME,
+            HEARTBEAT_FRAME_TAG,
+        )
+
+        session_id = web_ui_manager.create_session(
+            str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        session = web_ui_manager.sessions[session_id]
+        web_ui_manager._pending_session_update = False
+        client = TestClient(web_ui_manager.app)
+        heartbeat = HEARTBEAT_FRAME.pack(HEARTBEAT_FRAME_TAG, 1700000000000.0)
+
+        with client.websocket_connect("/ws") as ws:
+            assert ws.receive_json()["type"] == "connection_established"
+            assert ws.receive_json()["type"] == "status_update"
+
+            # 狀態未變：get_status 無回應，下一幀即為心跳回應
+            ws.send_json({"type": "get_status"})
+            ws.send_bytes(heartbeat)
+            assert ws.receive_bytes() == heartbeat
+
+            # 心跳更新了活動時間，狀態已變更時照常發送
+            ws.send_json({"type": "get_status"})
+            message = ws.receive_json()
+            assert message["type"] == "status_update"
+            assert message["status_info"]["last_activity"] == session.last_activity
+
+    def test_websocket_binary_feedback_with_images(
+        self, web_ui_manager, test_project_dir
+    ):
+        """測試以二進位幀提交附帶圖片原始字節的回饋"""
+        import base64
+        import json
+        import struct
+
+        from fastapi.testclient import TestClient
+
+        session_id = web_ui_manager.create_session(
+            str(test_project_dir), TestData.SAMPLE_SESSION["summary"]
+        )
+        session = web_ui_manager.sessions[session_id]
+        png = base64.b64decode(TestData.SAMPLE_IMAGE_BASE64.partition(",")[2])
+        header = json.dumps(
+            {
+                "type": "submit_feedback",
+                "feedback": "二進位回饋",
+                "images": [{"name": "a.png", "type": "image/png", "size": len(png)}],
+                "settings": {},
+            }
+        ).encode()
+        frame = struct.pack(">I", len(header)) + header + png
+
+        client = TestClient(web_ui_manager.app)
+        with client.websocket_connect("/ws") as ws:
+            ws.receive_json()
+            ws.send_bytes(frame)
+            # 心跳回應表示前一則消息已處理完畢
+            ws.send_text('{"type": "heartbeat", "timestamp": 1}')
+            while ws.receive_json()["type"] != "heartbeat_response":
+                pass
+
+        assert session.feedback_result == "二進位回饋"
+        images = session.load_images_for_response()
+        assert [img["data"] for img in images] == [png]
+        session.cleanup()
+
+    def test_response_stats_counted_from_body(self, web_ui_manager):
+        """測試響應統計按實際送出的 body 字節累計"""
+        from fastapi.testclient import TestClient
+
+        web_ui_manager._flush_compression_stats()
+
+        client = TestClient(web_ui_manager.app)
+        response = client.get(
+            "/api/current-session", headers={"Accept-Encoding": "identity"}
+        )
+
+        assert web_ui_manager._stats_requests == 1
+        assert web_ui_manager._stats_compressed == 0
+        assert web_ui_manager._stats_bytes == len(response.content)
+        assert web_ui_manager._stats_bytes_original == len(response.content)
+
+    def test_compression_ratio_from_gzipped_responses(self, web_ui_manager):
+        """測試壓縮響應的統計以壓縮前後的實際大小計算壓縮比"""
+        from fastapi.testclient import TestClient
+
+        from mcp_feedback_enhanced.web.utils.compression_config import (
+            get_compression_manager,
+        )
+
+        web_ui_manager._flush_compression_stats()
+        compression_manager = get_compression_manager()
+        compression_manager.reset_stats()
+
+        client = TestClient(web_ui_manager.app)
+        response = client.get("/static/js/app.js", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+
+        web_ui_manager._flush_compression_stats()
+        stats = compression_manager.get_stats()
+        assert stats["requests_compressed"] == 1
+        assert stats["bytes_original"] == len(response.content)
+        assert stats["bytes_compressed"] < stats["bytes_original"]
+        assert stats["compression_ratio"] > 0
+        compression_manager.reset_stats()
+
+    def test_static_files_conditional_requests(self, web_ui_manager):
+        """測試靜態文件支援 ETag / Last-Modified 條件請求"""
+        from fastapi.testclient import TestClient
+
+        client = TestClient(web_ui_manager.app)
+        response = client.get("/static/js/app.js")
+
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        assert response.headers.get("last-modified")
+
+        # 內容未變時應返回 304 且不帶 body，並保留緩存頭
+        not_modified = client.get("/static/js/app.js", headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+        assert "max-age" in not_modified.headers.get("cache-control", "")
+
+        not_modified = client.get(
+            "/static/js/app.js",
+            headers={"If-Modified-Since": response.headers["last-modified"]},
+        )
+        assert not_modified.status_code == 304
+
 
 class TestWebUIUtilities:
     """Web UI 工具函數測試"""
@@ -251,3 +956,23 @@ class TestWebUIUtilities:
             # 缺少必要字段
         }
         assert TestUtils.validate_session_info(invalid_session) == False
+
+    def test_encode_static_message_cached(self):
+        """測試固定內容消息的序列化快取"""
+        import json
+
+        from mcp_feedback_enhanced.web.utils.ws_messages import (
+            encode_message,
+            encode_static_message,
+        )
+
+        first = encode_static_message(type="connection_established", messageCode="X")
+        assert json.loads(first) == {
+            "type": "connection_established",
+            "messageCode": "X",
+        }
+        assert (
+            encode_static_message(type="connection_established", messageCode="X")
+            is first
+        )
+        assert json.loads(encode_message({"type": "ping"})) == {"type": "ping"}